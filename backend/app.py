@@ -1,15 +1,31 @@
-from fastapi import FastAPI, Request, Form, Query
-from fastapi.responses import HTMLResponse, RedirectResponse
+import asyncio
+import json
+import time
+from contextlib import suppress
+from contextvars import ContextVar
+from fastapi import FastAPI, Request, Form, Query, Path, UploadFile, File
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from backend.core.auth import create_vault, unlock_vault, lock_vault, vault_exists
+from backend.core.auth import create_vault, vault_exists, vault_paths, recover_storage, breach_filter_path, target_kdf
+from backend.core.crypto import derive_key, generate_salt
+from backend.core.sessions import SessionCache
+from backend.core.admission import UnlockGate, UnlockRejected
+from backend.core import metrics
 from backend.core.vault import add_entry, update_password, update_entry_meta, add_note, update_note
-from backend.core.vault import enable_totp, get_totp_code
+from backend.core.vault import enable_totp, get_totp_code, totp_codes, reveal_password
 from backend.core.vault import soft_delete_entry, restore_entry
 from backend.core.vault import soft_delete_note, restore_note
-from backend.core.vault import detect_password_reuse, entries_needing_rotation
-from backend.utils.password_gen import generate_password
-from backend.utils.strength import check_strength
+from backend.core.vault import rotation_report, rotation_items, search_vault
+from backend.core.vault import tag_counts, filter_by_tags
+from backend.core.vault import list_page, listing_item
+from backend.core.vault import find_password_reuse, reuse_report, strength_report, breach_report
+from backend.core.vault import import_records
+from backend.core.transfer import load_import, export_records, export_stream, EXPORT_SECTIONS
+from backend.utils.password_gen import generate_passwords, generate_passphrases, MAX_BATCH
+from backend.utils.strength import score_password_async, score_many, shutdown_pool
+from backend.utils.breach import is_breached, check_many
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 
 app = FastAPI()
@@ -17,13 +33,91 @@ templates = Jinja2Templates(directory="backend/templates")
 
 app.mount("/static", StaticFiles(directory="backend/static"), name="static")
 
-MASTER_KEY = None
-VAULT = None 
+# unlocked vaults by session token; each owned by its single-writer actor
+SESSIONS = SessionCache()
+SESSION_COOKIE = "passman_session"
 
-def autosave():
-    global VAULT, MASTER_KEY
-    if VAULT is not None and MASTER_KEY is not None:
-        lock_vault(VAULT, MASTER_KEY)
+# throttles unlock attempts and runs their key derivation off the main threadpool
+UNLOCKS = UnlockGate()
+
+# the open vault of the session making the current request
+OPEN_VAULT = ContextVar("open_vault", default=None)
+
+# comment lines sent on idle event streams so proxies keep them open
+SSE_KEEPALIVE = 15
+
+PAGE_SIZE = 50
+
+def current_open():
+    opened = OPEN_VAULT.get()
+    return opened if opened is not None and not opened.actor.closed else None
+
+def current_actor():
+    opened = current_open()
+    return opened.actor if opened is not None else None
+
+def current_vault():
+    actor = current_actor()
+    return actor.vault if actor is not None else None
+
+def _clear_trash(vault):
+    vault.clear_section("trash")
+
+@app.on_event("startup")
+async def startup():
+    recover_storage()
+    SESSIONS.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await SESSIONS.close()
+    UNLOCKS.close()
+    shutdown_pool()
+
+@app.middleware("http")
+async def session_vault(request: Request, call_next):
+    # idle sessions expire in SESSIONS.get; their vault is flushed and
+    # zeroized once no session uses it
+    opened = await SESSIONS.get(request.cookies.get(SESSION_COOKIE))
+    if opened is not None:
+        try:
+            await opened.actor.refresh()
+        except RuntimeError:
+            # re-keyed or replaced by another process; unlock again
+            with suppress(RuntimeError):
+                await SESSIONS.close_vault(opened)
+            opened = None
+
+    reset = OPEN_VAULT.set(opened)
+    try:
+        return await call_next(request)
+    finally:
+        OPEN_VAULT.reset(reset)
+
+async def instrument(request: Request, call_next):
+    # outermost, so the session lookup and refresh are timed too. Streamed
+    # bodies are timed up to their headers
+    timings = [] if metrics.SERVER_TIMING else None
+    reset = metrics.request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.request_timings.reset(reset)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    metrics.observe(
+        "passman_request_seconds",
+        (("method", request.method), ("route", route.path if route is not None else "other")),
+        elapsed,
+    )
+    if timings is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, elapsed)
+    return response
+
+if metrics.ENABLED:
+    app.middleware("http")(instrument)
 
 @app.get("/", response_class=HTMLResponse)
 def lock_screen(request: Request):
@@ -33,52 +127,99 @@ def lock_screen(request: Request):
         )
     
 @app.post("/")
-def unlock(request: Request, master: str = Form(...)):
-    global MASTER_KEY, VAULT
-    
+async def unlock(request: Request, master: str = Form(...), user: str = Form(""), create: bool = Form(False)):
     try: 
-        if not vault_exists():
-            create_vault(master)
-            
-        VAULT = unlock_vault(master)
-        MASTER_KEY = master
-        
-        return RedirectResponse("/dashboard", status_code=302)
+        paths = vault_paths(user.strip().lower() or None)
+        async with UNLOCKS.admit(request.client.host if request.client else "", str(paths.directory)):
+            if create:
+                await UNLOCKS.run(create_vault, master, paths)
+            elif not vault_exists(paths):
+                # an unknown account gets the same answer, after the same
+                # key derivation, as a wrong password
+                await UNLOCKS.run(derive_key, master, generate_salt(), target_kdf())
+                raise ValueError("Invalid master password or corrupted vault")
+
+            token = await SESSIONS.open(master, paths, UNLOCKS.run)
+        await SESSIONS.drop(request.cookies.get(SESSION_COOKIE))
+
+        response = RedirectResponse("/dashboard", status_code=302)
+        response.set_cookie(SESSION_COOKIE, token, httponly=True, samesite="strict")
+        return response
     
+    except UnlockRejected as e:
+        return templates.TemplateResponse(
+            "lock.html",
+            {"request": request, "error": str(e), "user": user},
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
     except Exception as e:
         return templates.TemplateResponse(
             "lock.html",
-            {"request": request, "error": str(e)}
+            {"request": request, "error": str(e), "user": user}
         )
         
 @app.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request):
-    if not VAULT:
+async def dashboard(
+    request: Request,
+    sort: str = Query("site", pattern="^(site|updated_at)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+):
+    vault = current_vault()
+    if not vault:
         return RedirectResponse("/", status_code=302)
     
+    entries, entries_cursor = list_page(vault, "entries", sort, order, limit=PAGE_SIZE)
+    notes, notes_cursor = list_page(vault, "notes", sort, order, limit=PAGE_SIZE)
     return templates.TemplateResponse(
         "dashboard.html", 
         {
             "request": request,
-            "entries": VAULT["entries"],
-            "notes": VAULT["notes"]
+            "entries": entries,
+            "notes": notes,
+            "entries_cursor": entries_cursor,
+            "notes_cursor": notes_cursor,
+            "sort": sort,
+            "order": order
         }
     )
+
+def _stream_page(section: str, records: list, next_cursor: str | None):
+    yield '{"items": ['
+    for i, record in enumerate(records):
+        yield ("," if i else "") + json.dumps(listing_item(section, record))
+    yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+
+@app.get("/api/{section}")
+async def list_api(
+    section: str = Path(..., pattern="^(entries|notes)$"),
+    sort: str = Query("site", pattern="^(site|updated_at)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    cursor: str | None = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=500),
+):
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    try:
+        records, next_cursor = list_page(vault, section, sort, order, cursor, limit)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return StreamingResponse(_stream_page(section, records, next_cursor), media_type="application/json")
     
 @app.get("/lock")
-def lock():
-    global MASTER_KEY, VAULT
-    
-    if VAULT and MASTER_KEY:
-        lock_vault(VAULT, MASTER_KEY)
-        
-    VAULT = None
-    MASTER_KEY = None
-    return RedirectResponse("/", status_code=302)
+async def lock(request: Request):
+    await SESSIONS.drop(request.cookies.get(SESSION_COOKIE), compact=True)
+    response = RedirectResponse("/", status_code=302)
+    response.delete_cookie(SESSION_COOKIE)
+    return response
 
 @app.get("/add")
 def add_password_page(request: Request):
-    if not VAULT:
+    if not current_vault():
         return RedirectResponse("/", status_code=302)
     
     return templates.TemplateResponse(
@@ -87,7 +228,7 @@ def add_password_page(request: Request):
     )
 
 @app.post("/add")
-def add_password(
+async def add_password(
     request: Request,
     site: str = Form(...),
     username: str = Form(""),
@@ -95,14 +236,15 @@ def add_password(
     tags: str = Form("")
     
 ):
-    if not VAULT:
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
     
     try: 
         tag_list = [t.strip().lower() for t in tags.split(",") if t.strip()]
-        strength = check_strength(password)
+        result = await score_password_async(password)
         
-        if strength["score"] < 2:
+        if result["score"] < 2:
             return templates.TemplateResponse(
             "add_entry.html",
             {
@@ -114,22 +256,31 @@ def add_password(
             }
         )
         
-        reuse = detect_password_reuse(VAULT)
-        for a, b in reuse:
-            if password == a["password"]:
-                return templates.TemplateResponse(
-                    "add_entry.html",
-                    {
-                        "request": request,
-                        "error": "this password is already used for anothe entry",
-                        "site": site,
-                        "username": username,
-                        "tags": tags
-                    }
-                )
+        if is_breached(password, breach_filter_path()):
+            return templates.TemplateResponse(
+                "add_entry.html",
+                {
+                    "request": request,
+                    "error": "this password appears in a known data breach, please use another one",
+                    "site": site,
+                    "username": username,
+                    "tags": tags
+                }
+            )
+
+        if find_password_reuse(actor.vault, password):
+            return templates.TemplateResponse(
+                "add_entry.html",
+                {
+                    "request": request,
+                    "error": "this password is already used for anothe entry",
+                    "site": site,
+                    "username": username,
+                    "tags": tags
+                }
+            )
             
-        add_entry(VAULT, site, username, password, tag_list)
-        autosave()
+        await actor.submit("add", "entries", add_entry, site, username, password, tag_list)
         return RedirectResponse("/dashboard", status_code=302)
     
     except Exception as e:
@@ -146,7 +297,7 @@ def add_password(
 
 @app.get("/add-note", response_class=HTMLResponse)
 def add_note_page(request: Request):
-    if not VAULT:
+    if not current_vault():
         return RedirectResponse("/", status_code=302)
     
     return templates.TemplateResponse(
@@ -156,14 +307,14 @@ def add_note_page(request: Request):
 
 
 @app.post("/add-note")
-def save_note(request: Request, title: str = Form(...), content: str = Form(...), tags: str = Form("")):
-    if not VAULT:
+async def save_note(request: Request, title: str = Form(...), content: str = Form(...), tags: str = Form("")):
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
     
     try:
         tag_list = [t.strip().lower() for t in tags.split(",") if t.strip()]
-        add_note(VAULT, title, content, tag_list)
-        autosave()
+        await actor.submit("add", "notes", add_note, title, content, tag_list)
         return RedirectResponse("/dashboard", status_code=302)
     
     except Exception as e:
@@ -179,32 +330,90 @@ def generate(
     lower: bool = Query(False),
     digits: bool = Query(False),
     symbols: bool = Query(False),
+    count: int = Query(1, ge=1, le=MAX_BATCH),
+    mode: str = Query("password", pattern="^(password|passphrase)$"),
+    words: int = Query(6, ge=4, le=20),
+    separator: str = Query("-", max_length=3),
+    min_each: int = Query(1, ge=0, le=16),
+    min_score: int | None = Query(None, ge=0, le=4),
 ):
-    
+    # batches and zxcvbn filtering load the shared pools, so they need a session
+    if (count > 1 or min_score is not None) and current_vault() is None:
+        return {"error": "locked"}
+
     if not any([upper, lower, digits, symbols]):
         upper = lower = digits = symbols = True
         
-    pwd = generate_password(
-        length=length,
-        use_upper=upper,
-        use_lower=lower,
-        use_digits=digits,
-        use_symbols=symbols
-    )
-    return JSONResponse({"password": pwd})
+    try:
+        if mode == "passphrase":
+            passwords = generate_passphrases(count, words, separator, min_score=min_score)
+        else:
+            passwords = generate_passwords(
+                count,
+                length=length,
+                use_upper=upper,
+                use_lower=lower,
+                use_digits=digits,
+                use_symbols=symbols,
+                min_each=min_each,
+                min_score=min_score,
+            )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    if count == 1:
+        return JSONResponse({"password": passwords[0]})
+    return JSONResponse({"passwords": passwords})
+
+@app.post("/strength")
+async def strength_api(password: str = Form(...)):
+    # scored in the shared worker pool, so like batches it needs a session
+    if current_vault() is None:
+        return {"error": "locked"}
+    return await score_password_async(password)
+
+def _entry_passwords(vault, entries: list) -> list:
+    # one decryption per entry, kept off the event loop; remember=False
+    # leaves the secrets cache alone, so this is safe from a worker thread
+    return [vault.secrets(e, remember=False)["password"] for e in entries]
+
+@app.get("/strength/report")
+async def strength_report_api():
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    entries = list(vault["entries"].values())
+    passwords = await run_in_threadpool(_entry_passwords, vault, entries)
+    scores = await run_in_threadpool(score_many, passwords)
+    return strength_report(entries, scores)
+
+@app.get("/breach/report")
+async def breach_report_api():
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    entries = list(vault["entries"].values())
+    passwords = await run_in_threadpool(_entry_passwords, vault, entries)
+    flags = await run_in_threadpool(check_many, passwords, breach_filter_path())
+    if flags is None:
+        return JSONResponse({"error": "no breach filter is installed"}, status_code=404)
+    return breach_report(entries, flags)
 
 @app.get("/generator", response_class=HTMLResponse)
 def generator_page(request: Request):
-    if not VAULT:
+    if not current_vault():
         return RedirectResponse("/", status_code=302)
     return templates.TemplateResponse("generator.html", {"request": request}) 
 
 @app.get("/totp/{entry_id}", response_class=HTMLResponse)
-def totp_page(entry_id: str, request:Request):
-    if not VAULT:
+async def totp_page(entry_id: str, request:Request):
+    vault = current_vault()
+    if not vault:
         return RedirectResponse("/", status_code=302)
     
-    entry = next((e for e in VAULT["entries"] if e["id"] == entry_id), None)
+    entry = vault.find("entries", entry_id)
     if not entry:
         return RedirectResponse("/dashboard", status_code=302)
     
@@ -214,140 +423,324 @@ def totp_page(entry_id: str, request:Request):
     )
     
 @app.post("/totp/{entry_id}")
-def enable_totp_route(
+async def enable_totp_route(
     entry_id: str,
     secret: str = Form(...)
 ):
-    if not VAULT:
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
     
-    enable_totp(VAULT, entry_id, secret)
-    autosave()
+    await actor.submit("update", "entries", enable_totp, entry_id, secret)
     
     return RedirectResponse("/dashboard", status_code=302)
 
 @app.get("/totp-code/{entry_id}")
-def totp_code_api(entry_id: str):
-    if not VAULT:
+async def totp_code_api(entry_id: str):
+    vault = current_vault()
+    if not vault:
         return {"error": "locked"}
     
-    code = get_totp_code(VAULT, entry_id)
+    code = get_totp_code(vault, entry_id)
     return {"code": code}
 
+@app.get("/totp-codes")
+async def totp_codes_api(ids: list[str] | None = Query(None)):
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    return totp_codes(vault, ids)
+
+@app.get("/password/{entry_id}")
+async def password_api(entry_id: str):
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    try:
+        return {"password": reveal_password(vault, entry_id)}
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+
+@app.get("/search")
+async def search_api(
+    q: str = Query(""),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    return search_vault(vault, q, offset, limit)
+
+@app.get("/tags")
+async def tags_api(section: str | None = Query(None, pattern="^(entries|notes)$")):
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    return {"tags": tag_counts(vault, section)}
+
+@app.get("/tags/filter")
+async def tags_filter_api(
+    tag: list[str] = Query(...),
+    mode: str = Query("and", pattern="^(and|or)$"),
+):
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    results = filter_by_tags(vault, tag, mode)
+    return {"total": len(results), "results": results}
+
+@app.get("/reuse")
+async def reuse_api():
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    return reuse_report(vault)
+
+@app.get("/rotation")
+async def rotation_api(soon_days: int = Query(14, ge=0, le=365)):
+    vault = current_vault()
+    if not vault:
+        return {"error": "locked"}
+
+    return rotation_report(vault, soon_days)
+
+@app.get("/rotation/events")
+async def rotation_events():
+    opened = current_open()
+    if opened is None:
+        return {"error": "locked"}
+
+    notifier = opened.notifier
+    queue = notifier.subscribe()
+
+    async def stream():
+        try:
+            while True:
+                try:
+                    due = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                vault = current_vault()
+                if due is None or vault is None:
+                    return
+                items = rotation_items(vault, [(i, when) for i, when in due if i in vault["entries"]])
+                if items:
+                    yield "event: rotation\ndata: " + json.dumps(items) + "\n\n"
+        finally:
+            notifier.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@app.get("/transfer", response_class=HTMLResponse)
+def transfer_page(request: Request):
+    if not current_vault():
+        return RedirectResponse("/", status_code=302)
+
+    return templates.TemplateResponse(
+        "transfer.html",
+        {"request": request, "error": None, "summary": None}
+    )
+
+@app.post("/import")
+async def import_data(request: Request, file: UploadFile = File(...), passphrase: str = Form("")):
+    actor = current_actor()
+    if actor is None:
+        return RedirectResponse("/", status_code=302)
+
+    try:
+        # zxcvbn takes milliseconds per password, so strength is left to
+        # /strength/report instead of holding up a large import
+        records = await run_in_threadpool(load_import, file.file, file.filename or "", passphrase)
+        summary = await actor.bulk(import_records, records)
+        return templates.TemplateResponse(
+            "transfer.html",
+            {"request": request, "error": None, "summary": summary}
+        )
+
+    except Exception as e:
+        return templates.TemplateResponse(
+            "transfer.html",
+            {"request": request, "error": str(e), "summary": None}
+        )
+
+@app.post("/export")
+async def export_data(request: Request, passphrase: str = Form(...)):
+    vault = current_vault()
+    if not vault:
+        return RedirectResponse("/", status_code=302)
+
+    if len(passphrase) < 8:
+        return templates.TemplateResponse(
+            "transfer.html",
+            {"request": request, "error": "export passphrase must be at least 8 characters", "summary": None}
+        )
+
+    records = [(section, record) for section in EXPORT_SECTIONS for record in vault[section].values()]
+    return StreamingResponse(
+        export_stream(export_records(vault, records), passphrase),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="passman-export.pmx"'},
+    )
+
+@app.get("/stats/writes")
+async def write_stats():
+    actor = current_actor()
+    if actor is None:
+        return {"error": "locked"}
+
+    return actor.metrics()
+
+@app.get("/metrics")
+async def metrics_api():
+    if not metrics.ENABLED:
+        return JSONResponse({"error": "metrics are disabled"}, status_code=404)
+
+    vaults = list(SESSIONS.vaults.values())
+    unlocks = UNLOCKS.metrics()
+    writes = [opened.actor.metrics() for opened in vaults]
+    samples = [
+        ("passman_sessions", "gauge", "Unexpired session tokens", [((), len(SESSIONS))]),
+        ("passman_open_vaults", "gauge", "Vaults unlocked in this process", [((), len(vaults))]),
+        ("passman_pending_writes", "gauge", "Changes waiting for the next group commit", [((), sum(w["pending"] for w in writes))]),
+        ("passman_unlocks_in_flight", "gauge", "Unlock attempts deriving keys or waiting to", [((), unlocks["in_flight"])]),
+        ("passman_unlock_attempts_total", "counter", "Unlock attempts by how they were handled",
+         [((("outcome", outcome),), unlocks[outcome]) for outcome in ("admitted", "throttled", "backed_off", "overloaded", "failed")]),
+    ]
+    return PlainTextResponse(metrics.render(samples), media_type="text/plain; version=0.0.4")
+
 @app.post("/delete/{entry_id}")
-def delete_entry(entry_id: str):
-    if not VAULT:
+async def delete_entry(entry_id: str):
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
     
-    soft_delete_entry(VAULT, entry_id)
-    autosave()
+    await actor.submit("delete", "entries", soft_delete_entry, entry_id)
     return RedirectResponse("/dashboard", status_code=302)
 
 @app.post("/restore/{entry_id}")
-def restore_entry_route(entry_id: str):
-    if not VAULT:
+async def restore_entry_route(entry_id: str):
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
     
-    restore_entry(VAULT, entry_id)
-    autosave()
+    await actor.submit("restore", "entries", restore_entry, entry_id)
     return RedirectResponse("/trash", status_code=302)
 
 @app.get("/trash", response_class=HTMLResponse)
-def trash_page(request: Request):
-    if not VAULT:
+async def trash_page(request: Request):
+    vault = current_vault()
+    if not vault:
         return RedirectResponse("/", status_code=302)
     
-    return templates.TemplateResponse("trash.html", {"request": request, "trash": VAULT["trash"]})
+    return templates.TemplateResponse("trash.html", {"request": request, "trash": vault["trash"].values()})
 
 @app.post("/trash/clear")
-def clear_trash():
-    if not VAULT:
+async def clear_trash():
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
     
-    VAULT["trash"].clear()
-    autosave()
+    await actor.submit("clear", "trash", _clear_trash)
     return RedirectResponse("/trash", status_code=302)
 
 @app.get("/edit/{entry_id}", response_class=HTMLResponse)
-def entry_edit_page(entry_id: str, request:Request):
-    if not VAULT:
+async def entry_edit_page(entry_id: str, request:Request):
+    vault = current_vault()
+    if not vault:
         return RedirectResponse("/", status_code=302)
     
-    entry = next((e for e in VAULT["entries"] if e["id"] == entry_id), None)
+    entry = vault.find("entries", entry_id)
     if not entry:
         return RedirectResponse("/dashboard", status_code=302)
     
     return templates.TemplateResponse("edit_entry.html", {"request": request, "entry": entry})
         
 @app.post("/edit/{entry_id}")
-def save_entry_meta(
+async def save_entry_meta(
     entry_id: str,
     site: str = Form(...),
     username: str = Form(""),
     tags: str = Form("")
 ):
+    actor = current_actor()
+    if actor is None:
+        return RedirectResponse("/", status_code=302)
+
     tag_list = [t.strip().lower() for t in tags.split(",") if t.strip()]
-    update_entry_meta(VAULT, entry_id, site, username, tag_list)
-    autosave()
+    await actor.submit("update", "entries", update_entry_meta, entry_id, site, username, tag_list)
     return RedirectResponse("/dashboard", status_code=302)
 
 
 @app.post("/change-password/{entry_id}")
-def change_password(
+async def change_password(
     entry_id: str,
     new_password: str = Form(...)
 ):
-    if VAULT is None:
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
     
     try:
-        strength = check_strength(new_password)
-        if strength["score"] < 2:
+        result = await score_password_async(new_password)
+        if result["score"] < 2:
             return "this paasword is too weak, use a stronger one"
-        update_password(VAULT, entry_id, new_password)
-        autosave()
+        if is_breached(new_password, breach_filter_path()):
+            return "this password appears in a known data breach, use another one"
+        if find_password_reuse(actor.vault, new_password, exclude_id=entry_id):
+            return "this password is already used for another entry"
+        await actor.submit("update", "entries", update_password, entry_id, new_password)
         return RedirectResponse("/dashboard", status_code=302)
     except ValueError as e:
         return str(e)
 
 @app.get("/edit-note/{note_id}", response_class=HTMLResponse)
-def edit_note_page(note_id: str, request: Request):
-    if not VAULT:
+async def edit_note_page(note_id: str, request: Request):
+    vault = current_vault()
+    if not vault:
         return RedirectResponse("/", status_code=302)
     
-    note = next((n for n in VAULT["notes"] if n["id"] == note_id), None)
+    note = vault.find("notes", note_id)
     if not note:
         return RedirectResponse("/dashboard", status_code=302)
 
     return templates.TemplateResponse(
         "edit_note.html",
-        {"request": request, "note": note}
+        {"request": request, "note": vault.unseal(note)}
     )
 
 @app.post("/edit-note/{note_id}")
-def save_new_note(note_id: str, title: str = Form(...), content: str = Form(...), tags: str = Form("")):
-    if not VAULT:
+async def save_new_note(note_id: str, title: str = Form(...), content: str = Form(...), tags: str = Form("")):
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
     
     tag_list = [t.strip().lower() for t in tags.split(",") if t.strip()]
-    update_note(VAULT, note_id, title, content, tag_list)
-    autosave()
+    await actor.submit("update", "notes", update_note, note_id, title, content, tag_list)
     return RedirectResponse("/dashboard", status_code=302)
 
 @app.post("/delete-note/{note_id}")
-def delete_note(note_id: str):
-    if VAULT is None:
+async def delete_note(note_id: str):
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
 
-    soft_delete_note(VAULT, note_id)
-    autosave()
+    await actor.submit("delete", "notes", soft_delete_note, note_id)
     return RedirectResponse("/dashboard", status_code=302)
 
 @app.post("/restore-note/{note_id}")
-def restore_note_route(note_id: str):
-    if VAULT is None:
+async def restore_note_route(note_id: str):
+    actor = current_actor()
+    if actor is None:
         return RedirectResponse("/", status_code=302)
 
-    restore_note(VAULT, note_id)
-    autosave()
+    await actor.submit("restore", "notes", restore_note, note_id)
     return RedirectResponse("/trash", status_code=302)
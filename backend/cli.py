@@ -0,0 +1,142 @@
+import argparse
+import getpass
+import json
+import sys
+from backend.core.auth import (
+    storage_lock,
+    unlock_vault,
+    recover_storage,
+    lock_vault,
+    target_kdf,
+    save_kdf_config,
+    vault_paths,
+    breach_filter_path,
+)
+from backend.core.crypto import KDFS, calibrate, kdf_supported
+from backend.core.transfer import load_import, export_records, export_stream, EXPORT_MAGIC, EXPORT_SECTIONS
+from backend.core.vault import import_records
+from backend.utils.password_gen import generate_passwords, generate_passphrases
+from backend.utils.strength import score_many, shutdown_pool
+from backend.utils.breach import build_filter
+
+
+def _paths(args):
+    paths = vault_paths(args.user)
+    recover_storage(paths)
+    return paths
+
+
+def import_command(args):
+    paths = _paths(args)
+    with open(args.file, "rb") as f:
+        passphrase = ""
+        if f.read(len(EXPORT_MAGIC)) == EXPORT_MAGIC:
+            passphrase = getpass.getpass("Export passphrase: ")
+        f.seek(0)
+        records = load_import(f, args.file, passphrase)
+    scores = None
+    if args.strength:
+        scores = score_many([r["password"] for section, r in records if section == "entries"])
+
+    # prompts come before the lock, so a waiting prompt never blocks the server
+    master = getpass.getpass("Master password: ")
+    with storage_lock(paths):
+        vault, session = unlock_vault(master, upgrade=False, paths=paths, locked=True)
+        try:
+            summary = import_records(vault, records, scores)
+            lock_vault(vault, session)
+        finally:
+            session.zeroize()
+    print(json.dumps(summary))
+
+
+def export_command(args):
+    passphrase = getpass.getpass("Export passphrase: ")
+    if len(passphrase) < 8:
+        raise ValueError("export passphrase must be at least 8 characters")
+
+    paths = _paths(args)
+    master = getpass.getpass("Master password: ")
+    with storage_lock(paths):
+        vault, session = unlock_vault(master, upgrade=False, paths=paths, locked=True)
+        session.zeroize()
+
+    records = [(section, record) for section in EXPORT_SECTIONS for record in vault[section].values()]
+    with open(args.file, "wb") as f:
+        for chunk in export_stream(export_records(vault, records), passphrase, target_kdf()):
+            f.write(chunk)
+    print(f"exported {len(records)} records to {args.file}")
+
+
+def calibrate_command(args):
+    if not kdf_supported(args.kdf):
+        raise ValueError(f"KDF {args.kdf} is not supported by this OpenSSL build")
+
+    params = calibrate(args.kdf, args.target_ms / 1000, args.memory_mib * 1024 if args.memory_mib else None)
+    print(json.dumps(params))
+    if args.save:
+        save_kdf_config(params)
+        print("saved; vaults are re-keyed with these parameters on their next unlock")
+
+
+def generate_command(args):
+    if args.words:
+        passwords = generate_passphrases(args.count, args.words, min_score=args.min_score)
+    else:
+        passwords = generate_passwords(args.count, args.length, min_each=args.min_each, min_score=args.min_score)
+    sys.stdout.write("\n".join(passwords) + "\n")
+
+
+def breach_filter_command(args):
+    output = args.output or breach_filter_path()
+    count = build_filter(args.sources, output, args.min_count)
+    print(f"{count} breached password hashes written to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m backend.cli", description="PassMan vault tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="import a CSV, JSON or PassMan export file in one vault write")
+    importer.add_argument("file")
+    importer.add_argument("--user", help="a user's vault instead of the single-user one")
+    importer.add_argument("--strength", action="store_true", help="also count weak passwords (slow for large files)")
+    importer.set_defaults(run=import_command)
+
+    exporter = commands.add_parser("export", help="write an encrypted PassMan export")
+    exporter.add_argument("file")
+    exporter.add_argument("--user", help="a user's vault instead of the single-user one")
+    exporter.set_defaults(run=export_command)
+
+    calibrator = commands.add_parser("calibrate", help="pick KDF parameters for a target unlock time on this host")
+    calibrator.add_argument("--kdf", choices=KDFS, default="argon2id")
+    calibrator.add_argument("--target-ms", type=int, default=500)
+    calibrator.add_argument("--memory-mib", type=int, help="argon2id memory cost")
+    calibrator.add_argument("--save", action="store_true", help="store the parameters in config.json")
+    calibrator.set_defaults(run=calibrate_command)
+
+    generator = commands.add_parser("generate", help="print a batch of random passwords, one per line")
+    generator.add_argument("--count", type=int, default=1)
+    generator.add_argument("--length", type=int, default=16)
+    generator.add_argument("--min-each", type=int, default=1, help="characters of each set at least")
+    generator.add_argument("--words", type=int, help="passphrases of this many words instead")
+    generator.add_argument("--min-score", type=int, choices=range(5), help="regenerate anything zxcvbn scores lower")
+    generator.set_defaults(run=generate_command)
+
+    breach = commands.add_parser("breach-filter", help="build the offline breached-password filter from HIBP SHA-1 dumps")
+    breach.add_argument("sources", nargs="+", help="HASH:COUNT files, or per-prefix range files named after their prefix")
+    breach.add_argument("--min-count", type=int, default=1, help="leave out hashes seen fewer times than this")
+    breach.add_argument("--output", help="defaults to storage/breached.filter")
+    breach.set_defaults(run=breach_filter_command)
+
+    args = parser.parse_args()
+    try:
+        args.run(args)
+    except (ValueError, RuntimeError) as e:
+        sys.exit(f"error: {e}")
+    finally:
+        shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
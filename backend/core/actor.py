@@ -0,0 +1,242 @@
+import asyncio
+from backend.core.auth import (
+    storage_lock,
+    read_new_changes,
+    reload_vault,
+    record_changes,
+    commit_snapshot,
+    journal_changed,
+)
+from backend.core.journal import apply_change, encode_change, decode_change
+from backend.core.model import Vault
+from backend.core.session import SessionKey
+
+COMPACT_THRESHOLD = 256 * 1024
+
+# group commit: pending changes are flushed this many seconds after the
+# first one, or as soon as this many are waiting
+FLUSH_DELAY = 0.05
+FLUSH_MAX_PENDING = 256
+
+
+class VaultActor:
+    # The single writer for an unlocked vault. Mutations are queued and
+    # applied one at a time by the writer task on the event loop, so route
+    # handlers reading self.vault between awaits always see a consistent
+    # state. Applied changes only mark the vault dirty; a debounced flush
+    # writes them to the journal together. Encryption and file I/O run in
+    # the default executor, and the storage lock keeps other processes from
+    # writing at the same time.
+
+    def __init__(
+        self,
+        vault: Vault,
+        session: SessionKey,
+        compact_threshold: int = COMPACT_THRESHOLD,
+        flush_delay: float = FLUSH_DELAY,
+        flush_max_pending: int = FLUSH_MAX_PENDING,
+    ):
+        self.vault = vault
+        self.session = session
+        self.compact_threshold = compact_threshold
+        self.flush_delay = flush_delay
+        self.flush_max_pending = flush_max_pending
+
+        self.pending = []           # encoded changes not yet in the journal
+        self.pending_ids = {}       # record id -> index of its latest pending add/update
+        self.flush_timer = None
+        self.stats = {"mutations": 0, "flushes": 0, "flushed_changes": 0, "last_flush_size": 0}
+
+        self.queue = asyncio.Queue()
+        self.closed = False
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.pending)
+
+    async def _enqueue(self, handler, *args):
+        if self.closed:
+            raise RuntimeError("Vault is locked")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((handler, args, future))
+        return await future
+
+    async def submit(self, op: str, section: str, mutate, *args):
+        return await self._enqueue(self._apply, op, section, mutate, args)
+
+    async def flush(self):
+        return await self._enqueue(self._flush)
+
+    async def compact(self):
+        return await self._enqueue(self._compact)
+
+    async def bulk(self, mutate, *args):
+        # a large batch of changes is written as one snapshot instead of a
+        # journal record each
+        return await self._enqueue(self._compact, mutate, args)
+
+    async def refresh(self):
+        # pick up changes written by other processes since our last write
+        if journal_changed(self.session):
+            await self._enqueue(self._locked, self._catch_up)
+
+    async def close(self, compact: bool = False):
+        try:
+            await (self.compact() if compact else self.flush())
+        finally:
+            self.closed = True
+            await self.queue.put(None)
+            await self.task
+
+            while not self.queue.empty():
+                job = self.queue.get_nowait()
+                if job is not None and not job[2].done():
+                    job[2].set_exception(RuntimeError("Vault is locked"))
+            self.vault.forget_secrets()
+            self.session.zeroize()
+
+    def metrics(self) -> dict:
+        flushes = self.stats["flushes"]
+        return dict(
+            self.stats,
+            pending=len(self.pending),
+            mean_flush_size=self.stats["flushed_changes"] / flushes if flushes else 0.0,
+        )
+
+    async def _run(self):
+        while True:
+            job = await self.queue.get()
+            if job is None:
+                return
+
+            # a caller that gave up (disconnect, timeout) leaves its future
+            # cancelled; nothing a handler does may end the writer task
+            handler, args, future = job
+            try:
+                result = await handler(*args)
+            except BaseException as e:
+                if not future.done():
+                    future.set_exception(e)
+                if isinstance(e, asyncio.CancelledError) and asyncio.current_task().cancelling():
+                    raise
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+            # fold the journal into a snapshot once the writer is idle, or
+            # regardless once the journal has grown well past the threshold
+            size = self.session.offset
+            if size > self.compact_threshold and (self.queue.empty() or size > 4 * self.compact_threshold):
+                try:
+                    await self._compact()
+                except Exception:
+                    pass  # the journal is still intact; retried after the next write
+
+    def _schedule_flush(self):
+        if self.flush_timer is not None or self.closed:
+            return
+
+        def fire():
+            self.flush_timer = None
+            if not self.closed:
+                future = asyncio.get_running_loop().create_future()
+                # nobody awaits a timed flush; a failure is retried by the next one
+                future.add_done_callback(lambda f: f.exception())
+                self.queue.put_nowait((self._flush, (), future))
+
+        self.flush_timer = asyncio.get_running_loop().call_later(self.flush_delay, fire)
+
+    async def _locked(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        lock = storage_lock(self.session.paths)
+        await loop.run_in_executor(None, lock.__enter__)
+        try:
+            return await fn(loop, *args)
+        finally:
+            await loop.run_in_executor(None, lock.__exit__, None, None, None)
+
+    async def _catch_up(self, loop):
+        changes = await loop.run_in_executor(None, read_new_changes, self.session)
+        if changes is None:
+            self.vault = await loop.run_in_executor(None, reload_vault, self.session, True)
+        elif not changes:
+            return
+        else:
+            for change in changes:
+                apply_change(self.vault, *change)
+
+        # our unflushed changes will land after the ones just read, so
+        # replay them on top to keep memory in the same order as the disk
+        for raw in self.pending:
+            apply_change(self.vault, *decode_change(raw))
+
+    def _queue_change(self, op: str, section: str, record):
+        raw = encode_change(op, section, record)
+        record_id = record["id"] if record else None
+
+        # a later update to a record that is already waiting to be written
+        # just replaces the pending payload
+        i = self.pending_ids.get(record_id)
+        if op == "update" and i is not None:
+            pending_op = decode_change(self.pending[i])[0]
+            self.pending[i] = encode_change(pending_op, section, record)
+        else:
+            self.pending.append(raw)
+            if op in ("add", "update"):
+                self.pending_ids[record_id] = len(self.pending) - 1
+            elif op == "clear":
+                self.pending_ids.clear()
+            else:
+                self.pending_ids.pop(record_id, None)
+
+    async def _apply(self, op, section, mutate, args):
+        if journal_changed(self.session):
+            await self._locked(self._catch_up)
+
+        record = mutate(self.vault, *args)
+        self._queue_change(op, section, record)
+        self.stats["mutations"] += 1
+
+        if len(self.pending) >= self.flush_max_pending:
+            await self._flush()
+        else:
+            self._schedule_flush()
+        return record
+
+    async def _flush(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if not self.pending:
+            return
+
+        async def write(loop):
+            await self._catch_up(loop)
+            changes = self.pending
+            await loop.run_in_executor(None, record_changes, self.session, changes)
+            self.pending = []
+            self.pending_ids = {}
+            self.stats["flushes"] += 1
+            self.stats["flushed_changes"] += len(changes)
+            self.stats["last_flush_size"] = len(changes)
+
+        await self._locked(write)
+
+    async def _compact(self, mutate=None, args=()):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+
+        async def write(loop):
+            await self._catch_up(loop)
+            result = mutate(self.vault, *args) if mutate else None
+            # serialized while it streams out; the vault can't change
+            # meanwhile, since every mutation waits on this queue
+            await loop.run_in_executor(None, commit_snapshot, self.vault, self.session)
+            # the snapshot already contains everything that was pending
+            self.pending = []
+            self.pending_ids = {}
+            return result
+
+        return await self._locked(write)
@@ -0,0 +1,121 @@
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import copy_context
+
+# key derivation gets its own threads, so an unlock storm queues up here
+# instead of taking the threadpool every other route runs on
+UNLOCK_WORKERS = 2
+# attempts allowed to wait for a worker; past that they are turned away
+MAX_WAITING = 8
+
+# per client: a burst of BURST attempts, then one every 1 / RATE seconds
+RATE = 0.2
+BURST = 5
+
+# after the nth failed attempt on an account from a client, the next one is
+# refused for BACKOFF_BASE * 2 ** (n - 1) seconds, up to BACKOFF_MAX
+BACKOFF_BASE = 1
+BACKOFF_MAX = 300
+
+# clients remembered by the buckets and the failure counts, oldest dropped
+MAX_CLIENTS = 10_000
+
+
+class UnlockRejected(RuntimeError):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, round(retry_after))
+
+
+class UnlockGate:
+    # Admission control for unlock attempts. Each attempt is checked, in
+    # order, against its backoff, its client's token bucket and the number
+    # of attempts already in flight, and rejected with UnlockRejected before
+    # any key derivation is done if one of them says no.
+
+    def __init__(self, workers: int = UNLOCK_WORKERS, max_waiting: int = MAX_WAITING):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.executor = None
+        self.in_flight = 0
+        self.buckets = OrderedDict()    # client -> [tokens, updated]
+        self.failures = OrderedDict()   # (client, account) -> [count, retry at]
+        self.stats = {"admitted": 0, "throttled": 0, "backed_off": 0, "overloaded": 0, "failed": 0}
+
+    async def run(self, fn, *args, **kwargs):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="unlock")
+        # in the caller's context, so timings reach its Server-Timing header
+        call = functools.partial(copy_context().run, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    def _take_token(self, client: str, now: float) -> float:
+        # 0 if the client may go ahead, else seconds until it may
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = [BURST, now]
+            if len(self.buckets) > MAX_CLIENTS:
+                self.buckets.popitem(last=False)
+        self.buckets.move_to_end(client)
+
+        bucket[0] = min(BURST, bucket[0] + (now - bucket[1]) * RATE)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return (1 - bucket[0]) / RATE
+        bucket[0] -= 1
+        return 0
+
+    def _admit(self, key: tuple, now: float):
+        failed = self.failures.get(key)
+        if failed is not None and now < failed[1]:
+            self.stats["backed_off"] += 1
+            raise UnlockRejected("Too many failed attempts, try again later", failed[1] - now)
+
+        wait = self._take_token(key[0], now)
+        if wait:
+            self.stats["throttled"] += 1
+            raise UnlockRejected("Too many unlock attempts, slow down", wait)
+
+        if self.in_flight >= self.workers + self.max_waiting:
+            self.stats["overloaded"] += 1
+            raise UnlockRejected("Server is busy unlocking other vaults, try again shortly", 1)
+
+    def _failed(self, key: tuple, now: float):
+        self.stats["failed"] += 1
+        failed = self.failures.get(key)
+        if failed is None:
+            failed = self.failures[key] = [0, now]
+            if len(self.failures) > MAX_CLIENTS:
+                self.failures.popitem(last=False)
+        self.failures.move_to_end(key)
+        failed[0] += 1
+        failed[1] = now + min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (failed[0] - 1))
+
+    @asynccontextmanager
+    async def admit(self, client: str, account: str):
+        # wraps one attempt; any exception out of it counts as a failure
+        key = (client, account)
+        self._admit(key, time.monotonic())
+        self.stats["admitted"] += 1
+        self.in_flight += 1
+        try:
+            yield
+        except Exception:
+            self._failed(key, time.monotonic())
+            raise
+        else:
+            self.failures.pop(key, None)
+        finally:
+            self.in_flight -= 1
+
+    def metrics(self) -> dict:
+        return dict(self.stats, in_flight=self.in_flight)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -1,93 +1,355 @@
+import itertools
 import json
+import logging
+import mmap
 import os
-from typing import Any, Dict
+import re
+from contextlib import contextmanager, nullcontext
+from typing import NamedTuple, Tuple
 from backend.core.crypto import (
     generate_salt,
     derive_key,
-    encrypt_data,
-    decrypt_data
+    default_kdf,
+    decrypt_data,
+    encrypt_stream,
+    decrypt_stream,
+    wrap_key,
+    unwrap_key,
+    LEGACY_KDF,
+)
+from backend.core.codec import encode_records, decode_records, codec_available
+from backend.core.model import Vault
+from backend.core.sealing import RecordCipher
+from backend.core.integrity import verify_hmac
+from backend.core.session import SessionKey
+from backend.core.metrics import timed
+from backend.core.journal import start_journal, append_changes, read_changes, replay, apply_change
+from backend.core.storage import (
+    FORMAT_VERSION,
+    FSYNC_BATCH,
+    atomic_write,
+    atomic_write_chunks,
+    encode_header,
+    read_header,
+    read_vault_header,
+    recover,
 )
-from backend.core.schema import new_vault
-from backend.core.integrity import compute_hmac, verify_hmac
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 STORAGE_DIR = BASE_DIR / "storage"
 CONFIG_PATH = BASE_DIR / "config.json"
 VAULT_PATH = STORAGE_DIR / "vault.enc"
+JOURNAL_PATH = STORAGE_DIR / "vault.journal"
+LOCK_PATH = STORAGE_DIR / "vault.lock"
 STORAGE_DIR.mkdir(exist_ok=True)
 
 
-def _load_config():
-    with open(CONFIG_PATH, "r") as f:
-        return json.load(f)
+USERNAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_.-]{0,63}$")
+
+
+class VaultPaths(NamedTuple):
+    vault: Path
+    journal: Path
+    lock: Path
+
+    @property
+    def directory(self) -> Path:
+        return self.vault.parent
+
+
+def vault_paths(user: str | None = None) -> VaultPaths:
+    # the single-user vault, or a user's own directory under storage/users
+    if user is None:
+        return VaultPaths(VAULT_PATH, JOURNAL_PATH, LOCK_PATH)
+
+    if not USERNAME_PATTERN.match(user):
+        raise ValueError("Username may only contain lowercase letters, digits, '.', '_' and '-'")
+    directory = Path(STORAGE_DIR) / "users" / user
+    return VaultPaths(directory / VAULT_PATH.name, directory / JOURNAL_PATH.name, directory / LOCK_PATH.name)
+
+
+def vault_exists(paths: VaultPaths | None = None) -> bool:
+    return os.path.exists((paths or vault_paths()).vault)
+
+
+def recover_storage(paths: VaultPaths | None = None):
+    paths = paths or vault_paths()
+    if not paths.directory.exists():
+        return
+    with storage_lock(paths):
+        recover(paths.directory, paths.vault, paths.journal, CONFIG_PATH)
+
+
+@contextmanager
+def storage_lock(paths: VaultPaths | None = None):
+    # serializes writers across processes (e.g. several uvicorn workers)
+    with open((paths or vault_paths()).lock, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_config() -> dict:
+    try:
+        with open(CONFIG_PATH, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def target_kdf() -> dict:
+    # the KDF new keys are derived with; set per deployment by
+    # `python -m backend.cli calibrate --save`
+    return _read_config().get("kdf") or default_kdf()
+
+
+def target_codec() -> str:
+    # "msgpack" trades load time for a snapshot half the size. A codec this
+    # install can't write would fail every unlock that upgrades the vault,
+    # so it falls back to json
+    codec = _read_config().get("codec") or "json"
+    if not codec_available(codec):
+        logger.warning("vault codec %r is not available, writing json instead", codec)
+        return "json"
+    return codec
+
+
+def breach_filter_path() -> Path:
+    # built by `python -m backend.cli breach-filter`; without one the
+    # breach checks are skipped
+    return Path(_read_config().get("breach_filter") or Path(STORAGE_DIR) / "breached.filter")
+
+
+def save_kdf_config(params: dict):
+    config = _read_config()
+    config["kdf"] = params
+    atomic_write(CONFIG_PATH, json.dumps(config, indent=2).encode())
+
 
+def serialize_vault(vault_data: Vault, codec: str = "json"):
+    records = ((section, record) for section, records in vault_data.items() for record in records.values())
+    return encode_records(records, codec)
 
-def _save_config(config):
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(config, f)
 
+def parse_vault(chunks, codec: str = "json"):
+    return decode_records(chunks, codec)
 
-def vault_exists() -> bool:
-    return os.path.exists(VAULT_PATH)
 
+def _commit(key: bytes, salt: bytes, kdf: dict, vault_data: Vault, paths: VaultPaths) -> bytes:
+    snapshot_id = os.urandom(16)
+    codec = target_codec()
+    header = encode_header(
+        {
+            "salt": salt.hex(),
+            "kdf": kdf,
+            "snapshot": snapshot_id.hex(),
+            "data_key": wrap_key(key, vault_data.cipher.data_key),
+            "codec": codec,
+            "version": FORMAT_VERSION,
+        }
+    )
 
-def create_vault(master_password: str):
-    if vault_exists():
+    # vault.enc is replaced first; the journal header still names the old
+    # snapshot until start_journal() swaps it, so a crash in between only
+    # leaves a stale journal that replay() ignores
+    body = encrypt_stream(serialize_vault(vault_data, codec), key, header)
+    atomic_write_chunks(paths.vault, itertools.chain([header], body))
+    start_journal(paths.journal, snapshot_id)
+    return snapshot_id
+
+
+def create_vault(master_password: str, paths: VaultPaths | None = None):
+    paths = paths or vault_paths()
+    if vault_exists(paths):
         raise RuntimeError("Vault already exists")
 
     salt = generate_salt()
-    key = derive_key(master_password, salt)
+    kdf = target_kdf()
+    key = derive_key(master_password, salt, kdf)
+
+    # checked again under the lock, so two creations can't race on vault.enc.tmp
+    paths.directory.mkdir(parents=True, exist_ok=True)
+    with storage_lock(paths):
+        if vault_exists(paths):
+            raise RuntimeError("Vault already exists")
+        _commit(key, salt, kdf, Vault(), paths)
+
+
+def _snapshot_id(header: dict) -> bytes:
+    return bytes.fromhex(header["hmac"] if header.get("version", 1) == 1 else header["snapshot"])
+
+
+def _read_snapshot(session: SessionKey) -> Tuple[Vault, bytes]:
+    with open(session.paths.vault, "rb") as f:
+        header, line = read_header(f)
+        if header.get("salt") != session.salt.hex():
+            raise RuntimeError("Vault was re-keyed, unlock it again")
+        # vaults from before per-record sealing get a fresh data key
+        cipher = RecordCipher(unwrap_key(session.key, header["data_key"]) if "data_key" in header else None)
+        snapshot_id = _snapshot_id(header)
 
-    empty_vault = json.dumps(new_vault()).encode()
-    encrypted_vault = encrypt_data(empty_vault, key)
+        if header.get("version", 1) == 1:
+            # a single Fernet token with a separate HMAC; rewritten in the
+            # current format on the next unlock
+            encrypted_vault = f.read()
+            if not verify_hmac(session.key, encrypted_vault, snapshot_id):
+                raise RuntimeError("Vault integrity check failed")
+            return Vault(json.loads(decrypt_data(encrypted_vault, session.key)), cipher), snapshot_id
 
-    os.makedirs("storage", exist_ok=True)
-    with open(VAULT_PATH, "wb") as f:
-        f.write(encrypted_vault)
-    
-    hmac_value = compute_hmac(key, encrypted_vault)
-    
-    config = _load_config()
-    config["salt"] = salt.hex()
-    config["hmac"] = hmac_value.hex()
-    _save_config(config)
+        # decrypted chunk by chunk straight out of the mapped file; only
+        # the parsed records stay in memory, secrets still sealed
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            records = parse_vault(decrypt_stream(mapped, session.key, line, len(line)), header.get("codec", "json"))
+            return Vault.from_records(records, cipher), snapshot_id
 
 
-def unlock_vault(master_password: str) -> Dict[str, Any]:
-    if not vault_exists():
+def _load(session: SessionKey, locked: bool = False) -> Vault:
+    # the snapshot is read without the storage lock; only a journal that
+    # doesn't match it is reset, and that is decided again under the lock,
+    # since another process may have compacted or appended in the meantime
+    paths = session.paths
+    while True:
+        # stamped before reading, so a write that races the load still
+        # shows up as a change on the next check
+        session.journal_stamp = _journal_stamp(paths)
+        vault, snapshot_id = _read_snapshot(session)
+        replayed = replay(paths.journal, session.key, snapshot_id, vault)
+        if replayed is not None:
+            break
+
+        with nullcontext() if locked else storage_lock(paths):
+            if _snapshot_id(read_vault_header(paths.vault)) != snapshot_id:
+                continue
+            replayed = replay(paths.journal, session.key, snapshot_id, vault)
+            if replayed is None:
+                start_journal(paths.journal, snapshot_id)
+                replayed = snapshot_id, os.path.getsize(paths.journal)
+                session.journal_stamp = _journal_stamp(paths)
+        break
+
+    session.snapshot_id = snapshot_id
+    session.chain, session.offset = replayed
+    session.unsynced = 0
+    return vault
+
+
+@timed("unlock_vault")
+def unlock_vault(
+    master_password: str,
+    upgrade: bool = True,
+    paths: VaultPaths | None = None,
+    locked: bool = False,
+) -> Tuple[Vault, SessionKey]:
+    # callers already holding the storage lock pass locked=True (and
+    # upgrade=False, since an upgrade takes it too)
+    paths = paths or vault_paths()
+    if not vault_exists(paths):
         raise RuntimeError("Vault does not exist")
 
-    config = _load_config()
+    header = read_vault_header(paths.vault)
 
-    if not config.get("salt"):
+    if not header.get("salt"):
         raise RuntimeError("Vault is corrupted or not initialized (missing salt)")
 
-    salt = bytes.fromhex(config["salt"])
-    key = derive_key(master_password, salt)
-    stored_hmac = bytes.fromhex(config["hmac"])
-    
-    with open(VAULT_PATH, "rb") as f:
-        encrypted_vault = f.read()
+    salt = bytes.fromhex(header["salt"])
+    kdf = header.get("kdf") or LEGACY_KDF
+    session = SessionKey(derive_key(master_password, salt, kdf), salt, kdf, paths=paths)
+    vault = _load(session, locked)
+
+    # older file formats and KDFs are rewritten on the first unlock
+    stale = header.get("version", 1) != FORMAT_VERSION or "data_key" not in header
+    if upgrade and (stale or kdf != target_kdf() or header.get("codec", "json") != target_codec()):
+        with storage_lock(paths):
+            return _rekey(master_password, vault, session)
+    return vault, session
+
+
+def _rekey(master_password: str, vault: Vault, session: SessionKey) -> Tuple[Vault, SessionKey]:
+    # re-encrypt under a fresh salt and the configured KDF. Processes still
+    # holding the old key notice the new salt on their next reload
+    header = read_vault_header(session.paths.vault)
+    if header["salt"] != session.salt.hex():
+        session.zeroize()
+        return unlock_vault(master_password, upgrade=False, paths=session.paths, locked=True)
+
+    changes = read_new_changes(session)
+    if changes is None:
+        vault = reload_vault(session, locked=True)
+    else:
+        for change in changes:
+            apply_change(vault, *change)
+
+    kdf = target_kdf()
+    salt = generate_salt()
+    rekeyed = SessionKey(derive_key(master_password, salt, kdf), salt, kdf, paths=session.paths)
+    commit_snapshot(vault, rekeyed)
+    session.zeroize()
+    return vault, rekeyed
+
+
+def reload_vault(session: SessionKey, locked: bool = False) -> Vault:
+    return _load(session, locked)
+
+
+def _journal_stamp(paths: VaultPaths):
+    try:
+        st = os.stat(paths.journal)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def journal_changed(session: SessionKey) -> bool:
+    # appended to, compacted or re-keyed by someone else since we last looked;
+    # size alone misses a compaction that leaves a journal of the same length
+    return _journal_stamp(session.paths) != session.journal_stamp
+
+
+def read_new_changes(session: SessionKey):
+    # changes other processes appended since we last looked; None means the
+    # snapshot itself was replaced and the vault must be reloaded
+    result = read_changes(session.paths.journal, session.key, session.snapshot_id, session.offset, session.chain)
+    if result is None:
+        return None
+
+    changes, session.chain, session.offset = result
+    session.journal_stamp = _journal_stamp(session.paths)
+    return changes
 
-    if not verify_hmac(key, encrypted_vault, stored_hmac):
-        raise RuntimeError("Vault integrity check failed")
-    
-    decrypted = decrypt_data(encrypted_vault, key)
-    return json.loads(decrypted.decode())
 
+@timed("journal_append")
+def record_changes(session: SessionKey, changes: list) -> int:
+    session.unsynced += len(changes)
+    fsync = FSYNC_BATCH > 0 and session.unsynced >= FSYNC_BATCH
+    # under the storage lock, right after catching up, so session.offset is
+    # the end of the last complete record on disk
+    session.chain, session.offset = append_changes(session.paths.journal, session.key, session.chain, changes, fsync, session.offset)
+    session.journal_stamp = _journal_stamp(session.paths)
+    if fsync:
+        session.unsynced = 0
+    return session.offset
 
 
-def lock_vault(vault_data: dict, master_password: str):
-    config = _load_config()
-    salt = bytes.fromhex(config["salt"])
+@timed("snapshot_write")
+def commit_snapshot(vault_data: Vault, session: SessionKey):
+    session.chain = session.snapshot_id = _commit(session.key, session.salt, session.kdf, vault_data, session.paths)
+    session.offset = os.path.getsize(session.paths.journal)
+    session.journal_stamp = _journal_stamp(session.paths)
+    session.unsynced = 0
 
-    key = derive_key(master_password, salt)
-    raw = json.dumps(vault_data).encode()
-    encrypted = encrypt_data(raw, key)
-    hmac_value = compute_hmac(key, encrypted)
-    config["hmac"] = hmac_value.hex()
-    _save_config(config)
 
-    with open(VAULT_PATH, "wb") as f:
-        f.write(encrypted)
+@timed("lock_vault")
+def lock_vault(vault_data: Vault, session: SessionKey):
+    commit_snapshot(vault_data, session)
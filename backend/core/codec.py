@@ -0,0 +1,174 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# how snapshot records are encoded; the name is stored in the vault header.
+# Records in memory always keep their JSON shape (string ids and ISO
+# timestamps), only the bytes on disk differ. msgpack halves the snapshot
+# but turning its binary fields back into strings costs more CPU than the C
+# JSON parser, so it is opt-in (see benchmarks/bench_codec.py)
+CODECS = ("json", "msgpack")
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# msgpack map keys are written as their index here, so this list is part of
+# the file format: only ever append to it
+KEYS = (
+    "id", "site", "username", "tags", "totp", "rotation_days", "created_at", "updated_at",
+    "title", "deleted_at", "type", "sealed", "password_digest",
+    "password", "password_history", "content",
+)
+KEY_IDS = {key: i for i, key in enumerate(KEYS)}
+
+
+def _json_encode(records):
+    # one JSON line per record, so the snapshot can be written and read back
+    # a chunk at a time
+    for section, record in records:
+        yield json.dumps([section, record]).encode() + b"\n"
+
+
+def _json_decode(chunks):
+    buf = b""
+    for chunk in chunks:
+        data = buf + chunk
+        end = data.rfind(b"\n") + 1
+        buf = data[end:]
+        if end:
+            # the complete lines of a chunk as one JSON array: one parser call
+            # per chunk instead of one per record
+            yield from json.loads(b"[" + data[:end - 1].replace(b"\n", b",") + b"]")
+    if buf:
+        raise RuntimeError("Vault file is truncated")
+
+
+# Each packer returns the value unchanged when it would not come back out
+# byte for byte (imported timestamps with an offset, non-UUID ids); the
+# unpackers tell the two apart by type
+
+def _pack_time(value):
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+    if dt.tzinfo is not None or dt.isoformat() != value:
+        return value
+    return (dt - EPOCH) // MICROSECOND
+
+
+def _unpack_time(value):
+    return (EPOCH + value * MICROSECOND).isoformat() if isinstance(value, int) else value
+
+
+def _pack_id(value):
+    try:
+        packed = bytes.fromhex(value.replace("-", ""))
+    except (AttributeError, ValueError):
+        return value
+    return packed if len(packed) == 16 and _unpack_id(packed) == value else value
+
+
+def _unpack_id(value):
+    # str(uuid.UUID(bytes=...)) without the cost of building a UUID
+    if not isinstance(value, bytes):
+        return value
+    h = value.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _pack_b64(value):
+    try:
+        raw = base64.b64decode(value)
+    except (TypeError, ValueError):
+        return value
+    return raw if base64.b64encode(raw).decode() == value else value
+
+
+def _unpack_b64(value):
+    return base64.b64encode(value).decode() if isinstance(value, bytes) else value
+
+
+def _pack_hex(value):
+    try:
+        raw = bytes.fromhex(value)
+    except (TypeError, ValueError):
+        return value
+    return raw if raw.hex() == value else value
+
+
+def _unpack_hex(value):
+    return value.hex() if isinstance(value, bytes) else value
+
+
+FIELDS = {
+    "id": (_pack_id, _unpack_id),
+    "created_at": (_pack_time, _unpack_time),
+    "updated_at": (_pack_time, _unpack_time),
+    "deleted_at": (_pack_time, _unpack_time),
+    "sealed": (_pack_b64, _unpack_b64),
+    "password_digest": (_pack_hex, _unpack_hex),
+}
+
+
+def _pack_record(record: dict) -> dict:
+    packed = {KEY_IDS.get(key, key): value for key, value in record.items()}
+    for field, (pack, _) in FIELDS.items():
+        key = KEY_IDS[field]
+        if key in packed:
+            packed[key] = pack(packed[key])
+    return packed
+
+
+def _unpack_record(packed: dict) -> dict:
+    record = {KEYS[key] if type(key) is int else key: value for key, value in packed.items()}
+    for field, (_, unpack) in FIELDS.items():
+        if field in record:
+            record[field] = unpack(record[field])
+    return record
+
+
+def _msgpack_encode(records):
+    packer = msgpack.Packer()
+    for section, record in records:
+        yield packer.pack((section, _pack_record(record)))
+
+
+def _msgpack_decode(chunks):
+    # the unpacker reads straight from each decrypted chunk and holds only
+    # the tail of a record that spans two of them
+    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+    fed = 0
+    for chunk in chunks:
+        unpacker.feed(chunk)
+        fed += len(chunk)
+        for section, packed in unpacker:
+            yield section, _unpack_record(packed)
+    if unpacker.tell() != fed:
+        raise RuntimeError("Vault file is truncated")
+
+
+def _codec(name: str):
+    if name == "json":
+        return _json_encode, _json_decode
+    if name == "msgpack" and msgpack is not None:
+        return _msgpack_encode, _msgpack_decode
+    raise ValueError(f"Unsupported vault codec: {name}")
+
+
+def codec_available(name: str) -> bool:
+    return name == "json" or (name == "msgpack" and msgpack is not None)
+
+
+def encode_records(records, codec: str = "json"):
+    # (section, record) pairs in, encoded pieces out
+    return _codec(codec)[0](records)
+
+
+def decode_records(chunks, codec: str = "json"):
+    return _codec(codec)[1](chunks)
@@ -1,38 +1,241 @@
 import base64
+import math
+import mmap
 import os
+import struct
+import time
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
+from cryptography.exceptions import UnsupportedAlgorithm, InvalidTag
 from cryptography.fernet import Fernet, InvalidToken
+from backend.core.metrics import timed
+
+try:
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+except ImportError:
+    Argon2id = None
 
 ITERATIONS = 200_000
 KEY_LENGTH = 32
-master_password: str = "abc123456789"
+
+CHUNK_SIZE = 64 * 1024
+NONCE_PREFIX = 7
+TAG_SIZE = 16
+_FRAME = struct.Struct(">I")
+
+KDFS = ("pbkdf2", "scrypt", "argon2id")
+
+# what every vault used before the KDF was recorded in its header
+LEGACY_KDF = {"name": "pbkdf2", "iterations": ITERATIONS}
+
+# starting points for calibration, and the least it settles for. argon2id
+# keeps its memory cost and scales the time cost; scrypt has only n, which
+# scales time and memory (128 * r * n bytes) together
+BASE_KDF = {
+    "pbkdf2": {"name": "pbkdf2", "iterations": 100_000},
+    "scrypt": {"name": "scrypt", "n": 2 ** 14, "r": 8, "p": 1},
+    "argon2id": {"name": "argon2id", "iterations": 3, "memory_cost": 64 * 1024, "lanes": 4},
+}
+
+# the most memory one calibrated scrypt derivation may take; unlocks run
+# several at a time
+SCRYPT_MAXMEM = 1024 ** 3
+
+# RFC 9106's second recommended Argon2id setting; scrypt where the
+# OpenSSL build has no Argon2
+ARGON2ID_KDF = {"name": "argon2id", "iterations": 3, "memory_cost": 64 * 1024, "lanes": 4}
+SCRYPT_KDF = {"name": "scrypt", "n": 2 ** 17, "r": 8, "p": 1}
+
 
 def generate_salt() -> bytes:
     return os.urandom(16)
 
-def derive_key(password: str, salt: bytes) -> bytes:
-    if not master_password:
-        raise ValueError("Master password cannot be empty")
-    
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=KEY_LENGTH,
-        salt=salt,
-        iterations=ITERATIONS,
-    )   
-    
-    return base64.urlsafe_b64encode(
-        kdf.derive(password.encode())
+
+def _kdf(params: dict, salt: bytes):
+    name = params.get("name")
+    if name == "pbkdf2":
+        return PBKDF2HMAC(algorithm=hashes.SHA256(), length=KEY_LENGTH, salt=salt, iterations=params["iterations"])
+    if name == "scrypt":
+        return Scrypt(salt=salt, length=KEY_LENGTH, n=params["n"], r=params["r"], p=params["p"])
+    if name == "argon2id" and Argon2id is not None:
+        return Argon2id(
+            salt=salt,
+            length=KEY_LENGTH,
+            iterations=params["iterations"],
+            lanes=params["lanes"],
+            memory_cost=params["memory_cost"],
         )
-    
+    raise ValueError(f"Unsupported KDF: {name}")
+
+
+def kdf_supported(name: str) -> bool:
+    # a cheap derivation; Argon2id needs OpenSSL 3.2 or newer
+    params = dict(BASE_KDF[name], iterations=1, n=2, memory_cost=8, lanes=1)
+    try:
+        _kdf(params, generate_salt()).derive(b"probe")
+    except (ValueError, UnsupportedAlgorithm):
+        return False
+    return True
+
+
+def default_kdf() -> dict:
+    return dict(ARGON2ID_KDF if kdf_supported("argon2id") else SCRYPT_KDF)
+
+
+@timed("derive_key")
+def derive_key(password: str, salt: bytes, params: dict | None = None) -> bytes:
+    if not password:
+        raise ValueError("Master password cannot be empty")
+
+    params = params or LEGACY_KDF
+    try:
+        key = _kdf(params, salt).derive(password.encode())
+    except UnsupportedAlgorithm:
+        raise ValueError(f"KDF {params['name']} is not supported by this OpenSSL build")
+
+    return base64.urlsafe_b64encode(key)
+
+
+def _time_kdf(params: dict) -> float:
+    start = time.perf_counter()
+    _kdf(params, generate_salt()).derive(b"calibration")
+    return time.perf_counter() - start
+
+
+def calibrate(name: str, target: float, memory_cost: int | None = None) -> dict:
+    # time the base parameters on this host, then scale them so one
+    # derivation takes about `target` seconds, never below the base
+    if name not in KDFS:
+        raise ValueError(f"Unsupported KDF: {name}")
+
+    params = dict(BASE_KDF[name])
+    if memory_cost and name == "argon2id":
+        params["memory_cost"] = memory_cost
+    scale = target / _time_kdf(params)
+
+    if name == "pbkdf2":
+        params["iterations"] = max(ITERATIONS, int(params["iterations"] * scale) // 1000 * 1000)
+    elif name == "scrypt":
+        limit = int(math.log2(SCRYPT_MAXMEM // (128 * params["r"])))
+        params["n"] = 2 ** min(limit, max(14, int(math.log2(params["n"] * scale))))
+    else:
+        params["iterations"] = max(BASE_KDF["argon2id"]["iterations"], int(params["iterations"] * scale))
+    return params
+
+
+@timed("encrypt_data")
 def encrypt_data(data: bytes, key: bytes) -> bytes:
     fernet = Fernet(key)
     return fernet.encrypt(data)
 
+@timed("decrypt_data")
 def decrypt_data(encrypted_data: bytes, key: bytes) -> bytes:
     fernet = Fernet(key)
     try:
         return fernet.decrypt(encrypted_data)
     except InvalidToken:
-        raise ValueError("Invalid master password or corrupted vault")
\ No newline at end of file
+        raise ValueError("Invalid master password or corrupted vault")
+
+
+def _subkey(key: bytes, info: bytes) -> AESGCM:
+    # session keys are Fernet keys; each other use gets its own subkey
+    raw = base64.urlsafe_b64decode(key)
+    return AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(raw))
+
+
+def _stream_cipher(key: bytes) -> AESGCM:
+    return _subkey(key, b"passman vault stream")
+
+
+def wrap_key(key: bytes, data_key: bytes) -> str:
+    nonce = os.urandom(12)
+    wrapped = nonce + _subkey(key, b"passman key wrap").encrypt(nonce, data_key, b"data key")
+    return base64.b64encode(wrapped).decode()
+
+
+def unwrap_key(key: bytes, wrapped: str) -> bytes:
+    wrapped = base64.b64decode(wrapped)
+    try:
+        return _subkey(key, b"passman key wrap").decrypt(wrapped[:12], wrapped[12:], b"data key")
+    except InvalidTag:
+        raise ValueError("Invalid master password or corrupted vault")
+
+
+def _nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    return prefix + struct.pack(">IB", counter, last)
+
+
+def _rechunk(pieces, size: int):
+    buf = bytearray()
+    for piece in pieces:
+        buf += piece
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+    yield bytes(buf)
+
+
+def encrypt_stream(pieces, key: bytes, aad: bytes):
+    # STREAM construction: every chunk is sealed under one random nonce
+    # prefix plus its index and a last-chunk flag, so chunks cannot be
+    # reordered, dropped or cut off without failing authentication.
+    # Output is the prefix, then a length-prefixed frame per chunk
+    aead = _stream_cipher(key)
+    prefix = os.urandom(NONCE_PREFIX)
+    yield prefix
+
+    counter, pending = 0, None
+    for chunk in _rechunk(pieces, CHUNK_SIZE):
+        if pending is not None:
+            sealed = aead.encrypt(_nonce(prefix, counter, False), pending, aad)
+            yield _FRAME.pack(len(sealed)) + sealed
+            counter += 1
+        pending = chunk
+
+    sealed = aead.encrypt(_nonce(prefix, counter, True), pending, aad)
+    yield _FRAME.pack(len(sealed)) + sealed
+
+
+def _release(buf, start: int, end: int) -> int:
+    # drop the pages of an mmap that were decrypted already, so a large
+    # vault doesn't stay resident as well as parsed; returns the new start
+    end -= end % mmap.PAGESIZE
+    if end > start and isinstance(buf, mmap.mmap) and hasattr(mmap, "MADV_DONTNEED"):
+        buf.madvise(mmap.MADV_DONTNEED, start, end - start)
+        return end
+    return start
+
+
+def decrypt_stream(buf, key: bytes, aad: bytes, offset: int = 0):
+    # yields plaintext chunks, holding at most one in memory. buf is any
+    # bytes-like object, normally the mapped vault file
+    aead = _stream_cipher(key)
+    end = len(buf)
+    prefix = bytes(buf[offset:offset + NONCE_PREFIX])
+    pos = offset + NONCE_PREFIX
+    released = 0
+    counter = 0
+
+    while True:
+        if len(prefix) != NONCE_PREFIX or pos + _FRAME.size > end:
+            raise ValueError("Vault file is truncated")
+        (size,) = _FRAME.unpack_from(buf, pos)
+        if size > CHUNK_SIZE + TAG_SIZE:
+            raise ValueError("Vault file is corrupted")
+        start, pos = pos + _FRAME.size, pos + _FRAME.size + size
+        if pos > end:
+            raise ValueError("Vault file is truncated")
+
+        last = pos == end
+        try:
+            chunk = aead.decrypt(_nonce(prefix, counter, last), buf[start:pos], aad)
+        except InvalidTag:
+            raise ValueError("Invalid master password or corrupted vault")
+        released = _release(buf, released, pos)
+        yield chunk
+        if last:
+            return
+        counter += 1
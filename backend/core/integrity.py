@@ -1,6 +1,8 @@
 import hmac
 import hashlib
+from backend.core.metrics import timed
 
+@timed("compute_hmac")
 def compute_hmac(key: bytes, data: bytes) -> bytes:
     return hmac.new(key, data, hashlib.sha256).digest()
 
@@ -0,0 +1,111 @@
+import json
+import os
+from backend.core.crypto import encrypt_data, decrypt_data
+from backend.core.integrity import compute_hmac, verify_hmac
+from backend.core.storage import atomic_write
+
+OPS = ("add", "update", "delete", "restore", "clear")
+
+
+def start_journal(path, snapshot_id: bytes, fsync: bool = True):
+    atomic_write(path, snapshot_id.hex().encode() + b"\n", fsync)
+
+
+def encode_change(op: str, section: str, record=None) -> bytes:
+    if op not in OPS:
+        raise ValueError(f"Unknown journal op: {op}")
+    return json.dumps({"op": op, "section": section, "record": record}).encode()
+
+
+def decode_change(raw: bytes):
+    change = json.loads(raw.decode())
+    return change["op"], change["section"], change["record"]
+
+
+def append_changes(path, key: bytes, prev_mac: bytes, changes: list, fsync: bool = True, offset: int | None = None):
+    # each change is encrypted and chained on its own, but the batch goes
+    # to disk in a single write and at most one fsync. Written at offset,
+    # the end of the last complete record, when the caller knows it: a torn
+    # record left there by a crash or a failed write is overwritten instead
+    # of ending up in the middle of the journal
+    mac = prev_mac
+    lines = []
+    for raw in changes:
+        token = encrypt_data(raw, key)
+        mac = compute_hmac(key, mac + token)
+        lines.append(mac.hex().encode() + b" " + token + b"\n")
+
+    with open(path, "r+b") as f:
+        if offset is None:
+            f.seek(0, os.SEEK_END)
+        else:
+            f.seek(offset)
+        f.write(b"".join(lines))
+        f.truncate()
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+        offset = f.tell()
+
+    return mac, offset
+
+
+def append_record(path, key: bytes, prev_mac: bytes, op: str, section: str, record=None, fsync: bool = True):
+    return append_changes(path, key, prev_mac, [encode_change(op, section, record)], fsync)
+
+
+def read_changes(path, key: bytes, snapshot_id: bytes, offset: int = 0, mac: bytes | None = None):
+    # returns (changes, last mac, end offset), or None when the journal
+    # belongs to a different snapshot (already folded in, or replaced by
+    # another process's compaction)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        if not header.endswith(b"\n") or bytes.fromhex(header.decode()) != snapshot_id:
+            return None
+        offset = max(offset, f.tell())
+        f.seek(offset)
+        data = f.read()
+
+    # only complete lines; a record still being appended is picked up next time
+    data = data[:data.rfind(b"\n") + 1]
+    mac = mac or snapshot_id
+    changes = []
+    for line in data.split(b"\n"):
+        if not line:
+            continue
+        mac_hex, token = line.split(b" ", 1)
+        expected = bytes.fromhex(mac_hex.decode())
+        if not verify_hmac(key, mac + token, expected):
+            raise RuntimeError("Vault journal integrity check failed")
+
+        changes.append(decode_change(decrypt_data(token, key)))
+        mac = expected
+
+    return changes, mac, offset + len(data)
+
+
+def replay(path, key: bytes, snapshot_id: bytes, vault: dict):
+    result = read_changes(path, key, snapshot_id)
+    if result is None:
+        return None
+
+    changes, mac, offset = result
+    for change in changes:
+        apply_change(vault, *change)
+    return mac, offset
+
+
+def apply_change(vault: dict, op: str, section: str, record=None):
+    if op in ("add", "update"):
+        vault.put(section, record)
+    elif op == "delete":
+        vault.remove(section, record["id"])
+        vault.put("trash", record)
+    elif op == "restore":
+        vault.remove("trash", record["id"])
+        vault.put(section, record)
+    elif op == "clear":
+        vault.clear_section("trash")
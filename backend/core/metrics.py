@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# PASSMAN_METRICS=0 turns instrumentation off; timed() then hands back the
+# function it was given, so disabled timers cost nothing at all
+ENABLED = os.environ.get("PASSMAN_METRICS", "1") != "0"
+
+# Server-Timing tells any client how long key derivation took, so it is
+# opt-in with PASSMAN_SERVER_TIMING=1
+SERVER_TIMING = ENABLED and os.environ.get("PASSMAN_SERVER_TIMING") == "1"
+
+# histogram bucket bounds in seconds, from cache hits up to slow KDFs
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HELP = {
+    "passman_operation_seconds": "Time spent in instrumented operations",
+    "passman_request_seconds": "Time to answer a request, up to the response headers",
+}
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += seconds
+
+
+_histograms = {}    # (metric, labels) -> Histogram
+_histograms_lock = threading.Lock()
+
+# (operation, seconds) for everything timed while answering the current
+# request, when Server-Timing is on
+request_timings = ContextVar("request_timings", default=None)
+
+
+def observe(metric: str, labels: tuple, seconds: float):
+    histogram = _histograms.get((metric, labels))
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault((metric, labels), Histogram())
+    histogram.observe(seconds)
+
+
+def record(operation: str, seconds: float):
+    observe("passman_operation_seconds", (("operation", operation),), seconds)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append((operation, seconds))
+
+
+def timed(operation: str):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(operation, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def timer(operation: str):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(operation, time.perf_counter() - start)
+
+
+def server_timing(timings: list, total: float) -> str:
+    # an operation that ran more than once is summed into one entry
+    merged = {}
+    for operation, seconds in timings:
+        merged[operation] = merged.get(operation, 0.0) + seconds
+    parts = [f"{operation};dur={spent * 1000:.2f}" for operation, spent in merged.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+def render(samples: list = ()) -> str:
+    # Prometheus text format: the histograms, then samples as
+    # (name, type, help, [(labels, value), ...]) from the caller
+    lines = []
+    with _histograms_lock:
+        histograms = sorted(_histograms.items())
+
+    for i, ((metric, labels), histogram) in enumerate(histograms):
+        if i == 0 or histograms[i - 1][0][0] != metric:
+            lines += [f"# HELP {metric} {HELP.get(metric, metric)}", f"# TYPE {metric} histogram"]
+        with histogram.lock:
+            counts, total = list(histogram.counts), histogram.sum
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), counts):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{metric}_sum{_labels(labels)} {total}")
+        lines.append(f"{metric}_count{_labels(labels)} {cumulative}")
+
+    for name, kind, description, values in samples:
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{_labels(labels)} {value}" for labels, value in values]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,86 @@
+from typing import Any, Dict
+from backend.core.schema import new_vault
+from backend.core.search import SearchIndex
+from backend.core.tags import TagIndex
+from backend.core.ordering import SortIndex
+from backend.core.reuse import ReuseIndex
+from backend.core.rotation import RotationIndex
+from backend.core.totp import TotpIndex
+from backend.core.sealing import RecordCipher, is_sealed
+
+SECTIONS = ("entries", "notes", "trash")
+
+
+class Vault(dict):
+    # each section maps id -> record; dicts keep insertion order, so listing
+    # order matches the on-disk lists while lookups and removals stay O(1).
+    # Secondary indexes are told about every put/remove so they stay current.
+
+    def __init__(self, data: Dict[str, Any] | None = None, cipher: RecordCipher | None = None):
+        super().__init__()
+        data = data or new_vault()
+        self.cipher = cipher or RecordCipher()
+        for section in SECTIONS:
+            self[section] = {}
+            for record in data.get(section, []):
+                if not is_sealed(record):
+                    self.cipher.seal(section, record)
+                self[section][record["id"]] = record
+
+        self.search = SearchIndex()
+        self.tags = TagIndex()
+        self.order = SortIndex()
+        self.reuse = ReuseIndex(self.cipher.digest)
+        self.rotation = RotationIndex()
+        self.totp = TotpIndex(self.cipher)
+        self.indexes = [self.search, self.tags, self.order, self.reuse, self.rotation, self.totp]
+        for index in self.indexes:
+            index.build(self)
+
+    @classmethod
+    def from_records(cls, records, cipher: RecordCipher | None = None):
+        # (section, record) pairs, as stored in a snapshot
+        data = new_vault()
+        for section, record in records:
+            data[section].append(record)
+        return cls(data, cipher)
+
+    def find(self, section: str, record_id: str):
+        return self[section].get(record_id)
+
+    def put(self, section: str, record: dict):
+        # plaintext records (new, edited, imported, or from an old journal)
+        # are sealed on the way in
+        if not is_sealed(record):
+            self.cipher.seal(section, record)
+        self[section][record["id"]] = record
+        for index in self.indexes:
+            index.add(section, record)
+        return record
+
+    def remove(self, section: str, record_id: str):
+        record = self[section].pop(record_id, None)
+        if record is not None:
+            for index in self.indexes:
+                index.discard(section, record)
+        return record
+
+    def clear_section(self, section: str):
+        for record in self[section].values():
+            for index in self.indexes:
+                index.discard(section, record)
+        self[section].clear()
+
+    def secrets(self, record: dict, remember: bool = True) -> dict:
+        return self.cipher.secrets(record, remember)
+
+    def unseal(self, record: dict, remember: bool = True) -> dict:
+        return self.cipher.unseal(record, remember)
+
+    def forget_secrets(self):
+        # everything kept decrypted; dropped when the vault is locked
+        self.cipher.clear()
+        self.totp.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {section: list(self[section].values()) for section in SECTIONS}
@@ -0,0 +1,85 @@
+import base64
+import json
+from bisect import bisect_left, bisect_right, insort
+
+SORT_FIELDS = {
+    "entries": ("site", "updated_at"),
+    "notes": ("title", "updated_at"),
+}
+
+
+def _sort_key(record: dict, field: str) -> str:
+    value = record.get(field) or ""
+    # ISO timestamps already sort chronologically as strings
+    return value if field == "updated_at" else value.lower()
+
+
+def encode_cursor(position) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        key, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return str(key), str(record_id)
+
+
+class SortIndex:
+    def __init__(self):
+        self.orders = {
+            (section, field): []
+            for section, fields in SORT_FIELDS.items()
+            for field in fields
+        }
+        self.doc_keys = {}    # id -> {(section, field): (key, id)}
+
+    def build(self, vault: dict):
+        for section, fields in SORT_FIELDS.items():
+            for record in vault[section].values():
+                self.doc_keys[record["id"]] = {
+                    (section, field): (_sort_key(record, field), record["id"]) for field in fields
+                }
+        for keys in self.doc_keys.values():
+            for order, position in keys.items():
+                self.orders[order].append(position)
+        for positions in self.orders.values():
+            positions.sort()
+
+    def add(self, section: str, record: dict):
+        if section not in SORT_FIELDS:
+            return
+        self.discard(section, record)
+
+        keys = {}
+        for field in SORT_FIELDS[section]:
+            position = (_sort_key(record, field), record["id"])
+            insort(self.orders[section, field], position)
+            keys[section, field] = position
+        self.doc_keys[record["id"]] = keys
+
+    def discard(self, section: str, record: dict):
+        keys = self.doc_keys.pop(record["id"], None)
+        if keys is None:
+            return
+
+        for order, position in keys.items():
+            positions = self.orders[order]
+            i = bisect_left(positions, position)
+            if i < len(positions) and positions[i] == position:
+                del positions[i]
+
+    def page(self, section: str, field: str, after=None, limit: int = 50, reverse: bool = False):
+        positions = self.orders[section, field]
+        if reverse:
+            end = bisect_left(positions, after) if after else len(positions)
+            start = max(0, end - limit)
+            page = positions[start:end][::-1]
+            more = start > 0
+        else:
+            start = bisect_right(positions, after) if after else 0
+            page = positions[start:start + limit]
+            more = start + limit < len(positions)
+
+        return [record_id for _, record_id in page], (page[-1] if page and more else None)
@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+
+class ReuseIndex:
+    # passwords are indexed by the keyed digest sealed records carry next to
+    # their metadata, never by their plaintext, so building the index does not
+    # decrypt anything
+
+    def __init__(self, digest):
+        self.digest = digest
+        self.ids = defaultdict(set)     # digest -> entry ids
+        self.doc_digest = {}            # entry id -> digest
+
+    def build(self, vault: dict):
+        for record in vault["entries"].values():
+            self.add("entries", record)
+
+    def add(self, section: str, record: dict):
+        if section != "entries":
+            return
+        self.discard(section, record)
+
+        digest = record["password_digest"]
+        self.ids[digest].add(record["id"])
+        self.doc_digest[record["id"]] = digest
+
+    def discard(self, section: str, record: dict):
+        digest = self.doc_digest.pop(record["id"], None)
+        if digest is None:
+            return
+
+        ids = self.ids[digest]
+        ids.discard(record["id"])
+        if not ids:
+            del self.ids[digest]
+
+    def users_of(self, password: str, exclude: str | None = None):
+        return self.users_of_digest(self.digest(password), exclude)
+
+    def users_of_digest(self, digest: str, exclude: str | None = None):
+        return self.ids.get(digest, set()) - {exclude}
+
+    def groups(self):
+        return [ids for ids in self.ids.values() if len(ids) > 1]
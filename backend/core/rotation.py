@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_ROTATION_DAYS = 180
+
+# the notifier looks again at least this often, to pick up entries that
+# were added or changed since it last went to sleep
+CHECK_INTERVAL = 60
+
+
+def _timestamp(record: dict, field: str):
+    # naive UTC, like the timestamps the vault writes itself
+    try:
+        value = datetime.fromisoformat(record[field])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class Schedule:
+    # min-heap of (due, id, version). Rescheduling or removing an id only
+    # updates self.due; the superseded heap entries are skipped when they
+    # surface and dropped when the heap is rebuilt
+
+    def __init__(self):
+        self.heap = []
+        self.due = {}       # id -> (due, version) of its live heap entry
+        self.versions = itertools.count()
+
+    def __len__(self):
+        return len(self.due)
+
+    def set(self, record_id: str, due: datetime):
+        version = next(self.versions)
+        self.due[record_id] = (due, version)
+        heapq.heappush(self.heap, (due, version, record_id))
+        self._maybe_rebuild()
+
+    def discard(self, record_id: str):
+        if self.due.pop(record_id, None) is not None:
+            self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        if len(self.heap) > 2 * len(self.due) + 64:
+            self.heap = [(due, version, i) for i, (due, version) in self.due.items()]
+            heapq.heapify(self.heap)
+
+    def pop_until(self, when: datetime):
+        # like until(), but takes what it yields out of the schedule
+        heap = self.heap
+        while heap and heap[0][0] <= when:
+            due, version, record_id = heapq.heappop(heap)
+            if self.due.get(record_id) == (due, version):
+                del self.due[record_id]
+                yield record_id, due
+
+    def next_due(self):
+        heap = self.heap
+        while heap and self.due.get(heap[0][2]) != heap[0][:2]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def until(self, when: datetime):
+        # (id, due) for everything due at or before `when`, earliest first.
+        # Walks the heap as a tree from the root and stops at the first node
+        # past `when`, so k results cost O(k log k) rather than touching all n
+        heap = self.heap
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            (due, version, record_id), i = heapq.heappop(frontier)
+            if due > when:
+                return
+            if self.due.get(record_id) == (due, version):
+                yield record_id, due
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+
+class RotationIndex:
+    # when each entry is due for rotation (updated_at + rotation_days) and
+    # how old it is, kept current by every put/remove so the rotation and
+    # expiry reports don't re-parse every timestamp on each call
+
+    def __init__(self):
+        self.rotation = Schedule()
+        self.created = Schedule()
+        self.changed = set()    # ids added or removed since take_changes()
+
+    def build(self, vault: dict):
+        for record in vault["entries"].values():
+            self.add("entries", record)
+
+    def add(self, section: str, record: dict):
+        if section != "entries":
+            return
+        self.discard(section, record)
+
+        # imported records may lack timestamps; they are just not scheduled
+        updated = _timestamp(record, "updated_at")
+        created = _timestamp(record, "created_at")
+        days = record.get("rotation_days")
+        if not isinstance(days, int):
+            days = DEFAULT_ROTATION_DAYS
+        if updated is not None:
+            self.rotation.set(record["id"], updated + timedelta(days=days))
+        if created is not None:
+            self.created.set(record["id"], created)
+
+    def discard(self, section: str, record: dict):
+        if section != "entries":
+            return
+        self.changed.add(record["id"])
+        self.rotation.discard(record["id"])
+        self.created.discard(record["id"])
+
+    def due(self, when: datetime):
+        return self.rotation.until(when)
+
+    def created_before(self, when: datetime):
+        return self.created.until(when)
+
+    def take_changes(self) -> set:
+        changed, self.changed = self.changed, set()
+        return changed
+
+
+class RotationNotifier:
+    # Pushes entries to subscribers as they fall due. Keeps its own schedule
+    # of the entries not announced yet, fed by the index's changes, so a
+    # check only pops what fell due since the last one and then sleeps until
+    # the next due time (at most CHECK_INTERVAL). Each subscriber gets an
+    # asyncio.Queue of lists of (id, due) pairs; None means the vault was
+    # locked.
+
+    def __init__(self, get_vault, interval: float = CHECK_INTERVAL):
+        self.get_vault = get_vault
+        self.interval = interval
+        self.subscribers = set()
+        self.notified = {}      # id -> due it was last announced for
+        self.index = None       # the RotationIndex self.pending follows
+        self.pending = Schedule()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def _sync(self, index: RotationIndex):
+        due = index.rotation.due
+        if index is not self.index:
+            # a reloaded vault comes with a new index: start over from it,
+            # keeping what was already announced for the same due time
+            index.take_changes()
+            self.index = index
+            self.notified = {i: d for i, d in self.notified.items() if i in due and due[i][0] == d}
+            self.pending = Schedule()
+            for record_id, (when, _) in due.items():
+                if record_id not in self.notified:
+                    self.pending.set(record_id, when)
+            return
+
+        for record_id in index.take_changes():
+            live = due.get(record_id)
+            if live is None:
+                self.notified.pop(record_id, None)
+                self.pending.discard(record_id)
+            elif self.notified.get(record_id) != live[0]:
+                self.notified.pop(record_id, None)
+                self.pending.set(record_id, live[0])
+
+    def check(self) -> float:
+        # announces what fell due since the last check; returns how long to
+        # sleep before the next one
+        vault = self.get_vault()
+        if vault is None:
+            return self.interval
+
+        self._sync(vault.rotation)
+        now = datetime.utcnow()
+        fresh = list(self.pending.pop_until(now))
+        self.notified.update(fresh)
+        self._publish(fresh)
+
+        upcoming = self.pending.next_due()
+        if upcoming is None:
+            return self.interval
+        return min(self.interval, (upcoming - now).total_seconds())
+
+    def _publish(self, fresh: list):
+        if fresh:
+            for queue in self.subscribers:
+                queue.put_nowait(fresh)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check())
+
+    async def close(self):
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+        self.subscribers.clear()
@@ -0,0 +1,103 @@
+import base64
+import json
+import os
+from collections import OrderedDict
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from backend.core.integrity import compute_hmac
+
+SECRET_CACHE_SIZE = 32
+NONCE_SIZE = 12
+
+
+def _plain_secrets(section: str, record: dict):
+    # pulls the secret fields out of a plaintext record
+    if section == "notes" or "content" in record:
+        return {"content": record.pop("content", "")}
+
+    totp = record.get("totp") or {}
+    record["totp"] = {"enabled": totp.get("enabled", False)}
+    return {
+        "password": record.pop("password", ""),
+        "password_history": record.pop("password_history", []),
+        "totp_secret": totp.get("secret"),
+    }
+
+
+class RecordCipher:
+    # Secret fields (passwords, their history, TOTP secrets, note bodies) are
+    # sealed per record with AES-GCM under a random per-vault data key and
+    # bound to the record id, so listing and search only ever see metadata.
+    # The data key is stored wrapped by the session key; re-keying the vault
+    # only re-wraps it. A few recently opened records are kept decrypted.
+
+    def __init__(self, data_key: bytes | None = None, cache_size: int = SECRET_CACHE_SIZE):
+        self.data_key = data_key or AESGCM.generate_key(bit_length=256)
+        self.aead = AESGCM(self.data_key)
+        # password digests for reuse detection, stored next to the metadata
+        self.digest_key = HKDF(
+            algorithm=hashes.SHA256(), length=32, salt=None, info=b"passman password digest"
+        ).derive(self.data_key)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()    # id -> (sealed blob, secrets)
+
+    def digest(self, password: str) -> str:
+        return compute_hmac(self.digest_key, password.encode()).hex()
+
+    def seal(self, section: str, record: dict) -> dict:
+        # in place: the plaintext fields are replaced by one sealed blob
+        secrets = _plain_secrets(section, record)
+        if "password" in secrets:
+            record["password_digest"] = self.digest(secrets["password"])
+
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = nonce + self.aead.encrypt(nonce, json.dumps(secrets).encode(), record["id"].encode())
+        record["sealed"] = base64.b64encode(sealed).decode()
+        self._remember(record["id"], record["sealed"], secrets)
+        return record
+
+    def secrets(self, record: dict, remember: bool = True) -> dict:
+        # remember=False for bulk reads (exports, reports) so they neither
+        # flush the cache nor touch it from another thread
+        cached = self.cache.get(record["id"]) if remember else None
+        if cached is not None and cached[0] == record["sealed"]:
+            self.cache.move_to_end(record["id"])
+            return cached[1]
+
+        sealed = base64.b64decode(record["sealed"])
+        try:
+            plain = self.aead.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], record["id"].encode())
+        except InvalidTag:
+            raise RuntimeError("Vault record integrity check failed")
+
+        secrets = json.loads(plain)
+        if remember:
+            self._remember(record["id"], record["sealed"], secrets)
+        return secrets
+
+    def unseal(self, record: dict, remember: bool = True) -> dict:
+        # a plaintext copy; the stored record stays sealed
+        plain = {k: v for k, v in record.items() if k not in ("sealed", "password_digest")}
+        secrets = self.secrets(record, remember)
+        if "content" in secrets:
+            plain["content"] = secrets["content"]
+        else:
+            plain["password"] = secrets["password"]
+            plain["password_history"] = list(secrets["password_history"])
+            plain["totp"] = dict(record.get("totp") or {}, secret=secrets["totp_secret"])
+        return plain
+
+    def _remember(self, record_id: str, sealed: str, secrets: dict):
+        self.cache[record_id] = (sealed, secrets)
+        self.cache.move_to_end(record_id)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def clear(self):
+        self.cache.clear()
+
+
+def is_sealed(record: dict) -> bool:
+    return "sealed" in record
@@ -0,0 +1,202 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"\w+")
+
+SEARCHABLE = ("entries", "notes")
+
+FIELD_WEIGHTS = {
+    "entries": {"site": 3, "username": 2, "tags": 2},
+    "notes": {"title": 3, "tags": 2},
+}
+
+EXACT, PREFIX, FUZZY = 3.0, 2.0, 1.0
+FUZZY_MIN_SIMILARITY = 0.5
+FUZZY_MAX_CANDIDATES = 50
+FUZZY_MAX_LENGTH_DELTA = 2
+FILTER_RATIO = 4
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(text.lower())
+
+
+def _ngrams(token: str):
+    padded = f"${token}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def _record_tokens(section: str, record: dict):
+    tokens = {}
+    for field, weight in FIELD_WEIGHTS[section].items():
+        value = record.get(field) or ""
+        if isinstance(value, list):
+            value = " ".join(value)
+        for token in tokenize(value):
+            if weight > tokens.get(token, 0):
+                tokens[token] = weight
+    return tokens
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = defaultdict(dict)    # token -> {id: field weight}
+        self.doc_tokens = {}                 # id -> {token: field weight}
+        self.doc_section = {}
+        self.vocabulary = []                 # sorted distinct tokens, for prefix lookups
+        self.ngrams = None                   # (length, bigram) -> tokens, built on the first fuzzy lookup
+
+    def build(self, vault: dict):
+        for section in SEARCHABLE:
+            for record in vault[section].values():
+                self._index(section, record, keep_sorted=False)
+        self.vocabulary = sorted(self.postings)
+
+    def _add_token(self, token: str, keep_sorted: bool):
+        if keep_sorted:
+            insort(self.vocabulary, token)
+        if self.ngrams is not None:
+            for gram in _ngrams(token):
+                self.ngrams[len(token), gram].add(token)
+
+    def _drop_token(self, token: str):
+        del self.postings[token]
+        i = bisect_left(self.vocabulary, token)
+        if i < len(self.vocabulary) and self.vocabulary[i] == token:
+            del self.vocabulary[i]
+        if self.ngrams is None:
+            return
+        for gram in _ngrams(token):
+            tokens = self.ngrams[len(token), gram]
+            tokens.discard(token)
+            if not tokens:
+                del self.ngrams[len(token), gram]
+
+    def add(self, section: str, record: dict):
+        if section in SEARCHABLE:
+            self.discard(section, record)
+            self._index(section, record, keep_sorted=True)
+
+    def _index(self, section: str, record: dict, keep_sorted: bool):
+        doc_id = record["id"]
+        tokens = _record_tokens(section, record)
+        for token, weight in tokens.items():
+            if token not in self.postings:
+                self._add_token(token, keep_sorted)
+            self.postings[token][doc_id] = weight
+
+        self.doc_tokens[doc_id] = tokens
+        self.doc_section[doc_id] = section
+
+    def discard(self, section: str, record: dict):
+        doc_id = record["id"]
+        tokens = self.doc_tokens.pop(doc_id, None)
+        if tokens is None:
+            return
+
+        del self.doc_section[doc_id]
+        for token in tokens:
+            posting = self.postings[token]
+            posting.pop(doc_id, None)
+            if not posting:
+                self._drop_token(token)
+
+    def _prefix_tokens(self, term: str):
+        i = bisect_left(self.vocabulary, term)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+            yield self.vocabulary[i]
+            i += 1
+
+    def _fuzzy_tokens(self, term: str):
+        if self.ngrams is None:
+            self.ngrams = defaultdict(set)
+            for token in self.vocabulary:
+                for gram in _ngrams(token):
+                    self.ngrams[len(token), gram].add(token)
+
+        grams = _ngrams(term)
+        shared = defaultdict(int)
+        for length in range(max(1, len(term) - FUZZY_MAX_LENGTH_DELTA), len(term) + FUZZY_MAX_LENGTH_DELTA + 1):
+            for gram in grams:
+                for token in self.ngrams.get((length, gram), ()):
+                    shared[token] += 1
+
+        scored = []
+        for token, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(token) + 1)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, token))
+        return heapq.nlargest(FUZZY_MAX_CANDIDATES, scored)
+
+    def _match_term(self, term: str):
+        scores = {}
+
+        def merge(token, factor):
+            for doc_id, weight in self.postings[token].items():
+                score = weight * factor
+                if score > scores.get(doc_id, 0):
+                    scores[doc_id] = score
+
+        for token in self._prefix_tokens(term):
+            merge(token, EXACT if token == term else PREFIX)
+
+        if not scores:
+            for similarity, token in self._fuzzy_tokens(term):
+                merge(token, FUZZY * similarity)
+
+        return scores
+
+    def _estimate(self, term: str) -> int:
+        return sum(len(self.postings[token]) for token in self._prefix_tokens(term))
+
+    def _filter_term(self, candidates: dict, term: str):
+        # once the candidate set is small, checking each candidate's own
+        # tokens is cheaper than walking the postings of a common term
+        scores = {}
+        for doc_id, total in candidates.items():
+            best = 0
+            for token, weight in self.doc_tokens[doc_id].items():
+                if token.startswith(term):
+                    best = max(best, weight * (EXACT if token == term else PREFIX))
+            if best:
+                scores[doc_id] = total + best
+
+        if scores:
+            return scores
+
+        fuzzy = self._match_term(term)
+        return {doc_id: total + fuzzy[doc_id] for doc_id, total in candidates.items() if doc_id in fuzzy}
+
+    def search(self, query: str, sections=SEARCHABLE, offset: int = 0, limit: int | None = 20):
+        terms = tokenize(query)
+        if not terms:
+            return 0, []
+
+        # most selective term first, then narrow the candidate set with the rest
+        estimates = {term: self._estimate(term) for term in terms}
+        terms = sorted(estimates, key=estimates.get)
+        totals = self._match_term(terms[0])
+        for term in terms[1:]:
+            if not totals:
+                break
+            if len(totals) * FILTER_RATIO < estimates[term]:
+                totals = self._filter_term(totals, term)
+            else:
+                scores = self._match_term(term)
+                totals = {doc_id: total + scores[doc_id] for doc_id, total in totals.items() if doc_id in scores}
+
+        if not totals:
+            return 0, []
+
+        hits = [
+            (score, doc_id) for doc_id, score in totals.items()
+            if self.doc_section[doc_id] in sections
+        ]
+        if limit is None:
+            ranked = sorted(hits, key=lambda hit: (-hit[0], hit[1]))[offset:]
+        else:
+            ranked = heapq.nsmallest(offset + limit, hits, key=lambda hit: (-hit[0], hit[1]))[offset:]
+
+        return len(hits), [(doc_id, self.doc_section[doc_id], score) for score, doc_id in ranked]
@@ -0,0 +1,25 @@
+IDLE_TIMEOUT = 300
+
+
+class SessionKey:
+    def __init__(self, key: bytes, salt: bytes, kdf: dict | None = None, paths=None):
+        self._key = bytearray(key)
+        self.salt = salt
+        self.kdf = kdf
+        self.paths = paths
+        self.snapshot_id = None
+        self.chain = None
+        self.offset = 0
+        self.journal_stamp = None
+        self.unsynced = 0
+
+    @property
+    def key(self) -> bytes:
+        if not self._key:
+            raise RuntimeError("Session key has been zeroized")
+        return bytes(self._key)
+
+    def zeroize(self):
+        for i in range(len(self._key)):
+            self._key[i] = 0
+        self._key = bytearray()
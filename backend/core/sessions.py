@@ -0,0 +1,168 @@
+import asyncio
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+from fastapi.concurrency import run_in_threadpool
+from backend.core.actor import VaultActor
+from backend.core.auth import VaultPaths, unlock_vault, recover_storage
+from backend.core.crypto import derive_key
+from backend.core.model import SECTIONS
+from backend.core.rotation import RotationNotifier
+from backend.core.session import IDLE_TIMEOUT
+
+# limits on the unlocked vaults kept in one process; past either one the
+# least recently used vault is flushed and closed
+MAX_OPEN_VAULTS = 256
+MAX_CACHE_BYTES = 1024 * 1024 * 1024
+
+# rough resident size of one loaded record with its index entries (~4.8 KB
+# measured on benchmarks/bench_load.py's vault, one 4 KB note per ten entries)
+RECORD_FOOTPRINT = 5 * 1024
+
+# how often sessions nobody came back to are looked for
+SWEEP_INTERVAL = 30
+
+
+class OpenVault:
+    # one unlocked vault, shared by every session of the user who opened it
+
+    def __init__(self, directory: str, actor: VaultActor):
+        self.directory = directory
+        self.actor = actor
+        self.notifier = RotationNotifier(lambda: None if actor.closed else actor.vault)
+        self.tokens = set()
+
+    @property
+    def vault(self):
+        return self.actor.vault
+
+    def footprint(self) -> int:
+        return sum(len(self.actor.vault[section]) for section in SECTIONS) * RECORD_FOOTPRINT
+
+    async def close(self, compact: bool = False):
+        # pending writes are always flushed; compact also folds the journal
+        # into a fresh snapshot. The actor zeroizes the key either way
+        await self.notifier.close()
+        await self.actor.close(compact)
+
+
+class SessionCache:
+    # Session tokens -> unlocked vaults. Tokens expire after idle_timeout
+    # without a request, and a vault is closed once its last token is gone.
+    # Both maps are kept in least recently used order, so expiring tokens
+    # and evicting vaults only ever looks at the ones that go.
+
+    def __init__(self, idle_timeout: int = IDLE_TIMEOUT, max_vaults: int = MAX_OPEN_VAULTS, max_bytes: int = MAX_CACHE_BYTES):
+        self.idle_timeout = idle_timeout
+        self.max_vaults = max_vaults
+        self.max_bytes = max_bytes
+        self.tokens = OrderedDict()     # token -> [directory, last used]
+        self.vaults = OrderedDict()     # directory -> OpenVault
+        self.sweeper = None
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def start(self):
+        self.sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def open(self, master_password: str, paths: VaultPaths, run=run_in_threadpool) -> str:
+        # a new session token for the vault at paths, unlocking it unless
+        # another session already has it open. Key derivation and loading
+        # go through run
+        directory = str(paths.directory)
+        opened = self.vaults.get(directory)
+        if opened is None or not await run(self._verify, opened, master_password):
+            if opened is None:
+                await run(recover_storage, paths)
+            vault, session = await run(unlock_vault, master_password, paths=paths)
+            opened = self.vaults.get(directory)
+            if opened is not None and opened.actor.session.salt == session.salt:
+                # another unlock of the same vault finished meanwhile
+                vault.forget_secrets()
+                session.zeroize()
+            else:
+                if opened is not None:
+                    # still under a key another process has since replaced
+                    await self.close_vault(opened)
+                opened = self.vaults[directory] = OpenVault(directory, VaultActor(vault, session))
+
+        token = secrets.token_urlsafe(32)
+        self.tokens[token] = [directory, time.monotonic()]
+        opened.tokens.add(token)
+        self.vaults.move_to_end(directory)
+        await self._evict(keep=directory)
+        return token
+
+    @staticmethod
+    def _verify(opened: OpenVault, master_password: str) -> bool:
+        session = opened.actor.session
+        return hmac.compare_digest(derive_key(master_password, session.salt, session.kdf), session.key)
+
+    async def get(self, token: str | None) -> OpenVault | None:
+        # the vault a session token unlocked, marking both as just used
+        entry = self.tokens.get(token)
+        if entry is None:
+            return None
+
+        directory, last_used = entry
+        now = time.monotonic()
+        if now - last_used > self.idle_timeout:
+            await self.drop(token)
+            return None
+
+        entry[1] = now
+        self.tokens.move_to_end(token)
+        self.vaults.move_to_end(directory)
+        return self.vaults[directory]
+
+    async def drop(self, token: str, compact: bool = False):
+        entry = self.tokens.pop(token, None)
+        if entry is None:
+            return
+        opened = self.vaults[entry[0]]
+        opened.tokens.discard(token)
+        if not opened.tokens:
+            await self._close(opened, compact)
+
+    async def close_vault(self, opened: OpenVault, compact: bool = False):
+        # ends every session of the vault, e.g. after another process re-keyed it
+        for token in opened.tokens:
+            self.tokens.pop(token, None)
+        opened.tokens.clear()
+        await self._close(opened, compact)
+
+    async def _close(self, opened: OpenVault, compact: bool):
+        if self.vaults.get(opened.directory) is opened:
+            del self.vaults[opened.directory]
+        await opened.close(compact)
+
+    async def _evict(self, keep: str):
+        total = sum(opened.footprint() for opened in self.vaults.values())
+        while len(self.vaults) > self.max_vaults or total > self.max_bytes:
+            directory, opened = next(iter(self.vaults.items()))
+            if directory == keep:
+                break
+            total -= opened.footprint()
+            await self.close_vault(opened)
+
+    async def sweep(self):
+        now = time.monotonic()
+        while self.tokens:
+            token, (_, last_used) = next(iter(self.tokens.items()))
+            if now - last_used <= self.idle_timeout:
+                return
+            await self.drop(token)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            await self.sweep()
+
+    async def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            self.sweeper = None
+        for opened in list(self.vaults.values()):
+            await self.close_vault(opened, compact=True)
@@ -0,0 +1,93 @@
+import json
+import os
+from pathlib import Path
+
+MAGIC = b"PASSMAN"
+# 1: one Fernet token, HMAC in the header
+# 2: AES-GCM chunk stream authenticated together with the header line
+FORMAT_VERSION = 2
+TMP_SUFFIX = ".tmp"
+
+# fsync the journal after this many appended records (1 = every record)
+FSYNC_BATCH = 1
+
+
+def fsync_dir(path):
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data: bytes, fsync: bool = True):
+    atomic_write_chunks(path, [data], fsync)
+
+
+def atomic_write_chunks(path, chunks, fsync: bool = True):
+    path = Path(path)
+    tmp = path.with_name(path.name + TMP_SUFFIX)
+
+    with open(tmp, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+    os.replace(tmp, path)
+    if fsync:
+        fsync_dir(path.parent)
+
+
+def encode_header(header: dict) -> bytes:
+    return MAGIC + b" " + json.dumps(header).encode() + b"\n"
+
+
+def read_header(f):
+    # returns the parsed header and its raw line, which the body authenticates
+    line = f.readline()
+    if not line.startswith(MAGIC + b" ") or not line.endswith(b"\n"):
+        raise RuntimeError("Vault file has an unknown format")
+    return json.loads(line[len(MAGIC) + 1:]), line
+
+
+def read_vault_header(path) -> dict:
+    with open(path, "rb") as f:
+        return read_header(f)[0]
+
+
+def truncate_torn_tail(path):
+    # drop a partially written last record left behind by a crash mid-append
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def recover(storage_dir, vault_path, journal_path, config_path):
+    storage_dir = Path(storage_dir)
+    for tmp in storage_dir.glob("*" + TMP_SUFFIX):
+        tmp.unlink()
+
+    if os.path.exists(vault_path):
+        with open(vault_path, "rb") as f:
+            legacy = f.read(len(MAGIC)) != MAGIC
+        if legacy:
+            # legacy layout: bare Fernet token with salt and HMAC kept in config.json
+            with open(config_path, "r") as f:
+                config = json.load(f)
+            if config.get("salt") and config.get("hmac"):
+                with open(vault_path, "rb") as f:
+                    data = f.read()
+                header = {"salt": config["salt"], "hmac": config["hmac"], "version": 1}
+                atomic_write(vault_path, encode_header(header) + data)
+
+    truncate_torn_tail(journal_path)
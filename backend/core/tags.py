@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+TAGGABLE = ("entries", "notes")
+
+
+class TagIndex:
+    def __init__(self):
+        self.ids = defaultdict(set)     # tag -> ids
+        self.doc_tags = {}              # id -> tags
+        self.doc_section = {}
+
+    def build(self, vault: dict):
+        for section in TAGGABLE:
+            for record in vault[section].values():
+                self.add(section, record)
+
+    def add(self, section: str, record: dict):
+        if section not in TAGGABLE:
+            return
+        self.discard(section, record)
+
+        doc_id = record["id"]
+        tags = {t.lower() for t in record.get("tags", [])}
+        for tag in tags:
+            self.ids[tag].add(doc_id)
+        self.doc_tags[doc_id] = tags
+        self.doc_section[doc_id] = section
+
+    def discard(self, section: str, record: dict):
+        doc_id = record["id"]
+        tags = self.doc_tags.pop(doc_id, None)
+        if tags is None:
+            return
+
+        del self.doc_section[doc_id]
+        for tag in tags:
+            ids = self.ids[tag]
+            ids.discard(doc_id)
+            if not ids:
+                del self.ids[tag]
+
+    def counts(self, section: str | None = None):
+        if section is None:
+            return {tag: len(ids) for tag, ids in self.ids.items()}
+
+        counts = {}
+        for tag, ids in self.ids.items():
+            n = sum(1 for doc_id in ids if self.doc_section[doc_id] == section)
+            if n:
+                counts[tag] = n
+        return counts
+
+    def match(self, tags, mode: str = "and"):
+        sets = sorted((self.ids.get(t.lower(), set()) for t in tags), key=len)
+        if not sets:
+            return set()
+        if mode == "and":
+            return set.intersection(*sets)
+        if mode == "or":
+            return set.union(*sets)
+        raise ValueError("mode must be 'and' or 'or'")
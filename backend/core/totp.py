@@ -0,0 +1,69 @@
+import time
+import pyotp
+
+PERIOD = 30
+
+
+class TotpIndex:
+    # Entries with TOTP turned on. Each secret is decrypted once into a
+    # generator, and the codes of all enabled entries are computed together
+    # once per time window and reused until it rolls over, so polling costs
+    # a dict lookup instead of a decrypt and an HMAC per entry per poll.
+
+    def __init__(self, cipher):
+        self.cipher = cipher
+        self.records = {}       # entry id -> record, enabled entries only
+        self.generators = {}    # entry id -> pyotp.TOTP, or None for a bad secret
+        self.window = None
+        self.codes = {}         # entry id -> code for self.window
+
+    def build(self, vault: dict):
+        for record in vault["entries"].values():
+            self.add("entries", record)
+
+    def add(self, section: str, record: dict):
+        if section != "entries":
+            return
+        self.discard(section, record)
+        if record.get("totp", {}).get("enabled"):
+            self.records[record["id"]] = record
+
+    def discard(self, section: str, record: dict):
+        if section != "entries":
+            return
+        self.records.pop(record["id"], None)
+        self.generators.pop(record["id"], None)
+        self.codes.pop(record["id"], None)
+
+    def _generator(self, entry_id: str):
+        if entry_id not in self.generators:
+            secret = self.cipher.secrets(self.records[entry_id], remember=False)["totp_secret"]
+            generator = pyotp.TOTP(secret, interval=PERIOD)
+            try:
+                generator.byte_secret()
+            except (TypeError, ValueError):
+                generator = None    # not base32; shown without a code
+            self.generators[entry_id] = generator
+        return self.generators[entry_id]
+
+    def current(self, now: float | None = None):
+        # codes of every enabled entry for the window `now` falls in, and the
+        # seconds left until it rolls over
+        now = time.time() if now is None else now
+        window = int(now // PERIOD)
+        if window != self.window:
+            self.window, self.codes = window, {}
+
+        if len(self.codes) != len(self.records):
+            for entry_id in self.records.keys() - self.codes.keys():
+                generator = self._generator(entry_id)
+                self.codes[entry_id] = generator.at(window * PERIOD) if generator else None
+        return self.codes, PERIOD - now % PERIOD
+
+    def code(self, entry_id: str):
+        return self.current()[0].get(entry_id)
+
+    def clear(self):
+        self.generators.clear()
+        self.codes.clear()
+        self.window = None
@@ -0,0 +1,237 @@
+import csv
+import json
+import pyotp
+from datetime import datetime, timezone
+from backend.core.crypto import generate_salt, derive_key, default_kdf, encrypt_data, decrypt_data
+from backend.core.schema import new_entry, new_note
+
+EXPORT_MAGIC = b"PASSMAN-EXPORT"
+EXPORT_VERSION = 1
+EXPORT_SECTIONS = ("entries", "notes")
+
+# column names used by the CSV exports of common password managers
+# (Bitwarden, LastPass, 1Password, KeePass, browsers), first match wins
+COLUMNS = {
+    "name": ("name", "title", "site", "account"),
+    "url": ("url", "login_uri", "website", "web site", "uri"),
+    "username": ("username", "login_username", "login name", "login", "user name", "email"),
+    "password": ("password", "login_password"),
+    "totp": ("totp", "login_totp", "otpauth", "one-time password"),
+    "notes": ("notes", "note", "extra", "comments"),
+    "tags": ("tags", "folder", "grouping", "group", "category"),
+    "type": ("type",),
+}
+
+NOTE_TYPES = ("note", "securenote", "secure note", "2")
+REQUIRED_FIELDS = {"entries": ("site", "username", "password"), "notes": ("title", "content")}
+
+
+def _pick(row: dict, field: str) -> str:
+    for column in COLUMNS[field]:
+        value = row.get(column)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+def _timestamp(value, fallback: str) -> str:
+    # naive UTC ISO strings like the ones schema.py writes; anything else is
+    # replaced, since the listings and the rotation index sort and compare them
+    if not isinstance(value, str):
+        return fallback
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return fallback
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def record_from_dump(section: str, record: dict):
+    # records from PassMan dumps and exports are rebuilt field by field with
+    # a fresh id, so one can't overwrite a live record or arrive unsealed
+    if section not in EXPORT_SECTIONS or not isinstance(record, dict):
+        raise ValueError("Import contains an invalid record")
+    for field in REQUIRED_FIELDS[section]:
+        if not isinstance(record.get(field), str):
+            raise ValueError(f"Import record is missing '{field}'")
+
+    tags = record.get("tags")
+    tags = [t for t in tags if isinstance(t, str)] if isinstance(tags, list) else []
+    if section == "notes":
+        rebuilt = new_note(record["title"], record["content"], tags)
+    else:
+        rebuilt = new_entry(record["site"], record["username"], record["password"], tags)
+        history = record.get("password_history")
+        if isinstance(history, list):
+            rebuilt["password_history"] = [p for p in history if isinstance(p, str)][-5:]
+        totp = record.get("totp")
+        if isinstance(totp, dict) and totp.get("enabled") is True and isinstance(totp.get("secret"), str):
+            rebuilt["totp"] = {"enabled": True, "secret": totp["secret"]}
+        days = record.get("rotation_days")
+        if type(days) is int and days > 0:
+            rebuilt["rotation_days"] = days
+
+    rebuilt["created_at"] = _timestamp(record.get("created_at"), rebuilt["created_at"])
+    rebuilt["updated_at"] = _timestamp(record.get("updated_at"), rebuilt["created_at"])
+    return section, rebuilt
+
+
+def _split_tags(value: str):
+    return [t.strip().lower() for t in value.replace(";", ",").split(",") if t.strip()]
+
+
+def _totp_secret(value: str):
+    if value.startswith("otpauth://"):
+        return pyotp.parse_uri(value).secret
+    return value.replace(" ", "").upper()
+
+
+def record_from_row(row: dict):
+    # one flat row from another manager -> (section, record)
+    row = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    name = _pick(row, "name") or _pick(row, "url")
+    password = _pick(row, "password")
+    notes = _pick(row, "notes")
+    tags = _split_tags(_pick(row, "tags"))
+
+    if _pick(row, "type").lower() in NOTE_TYPES or (not password and notes):
+        return "notes", new_note(name or "Untitled", notes, tags)
+    if not name:
+        raise ValueError("Import row has no site name or URL")
+
+    entry = new_entry(name, _pick(row, "username"), password, tags)
+    totp = _pick(row, "totp")
+    if totp:
+        entry["totp"] = {"enabled": True, "secret": _totp_secret(totp)}
+    return "entries", entry
+
+
+def parse_csv(lines):
+    # rows are read one at a time, so only the built records are kept in memory
+    for row in csv.DictReader(lines):
+        if any(row.values()):
+            yield record_from_row(row)
+
+
+def parse_jsonl(lines):
+    for line in lines:
+        if line.strip():
+            yield record_from_row(json.loads(line))
+
+
+def _bitwarden_row(item: dict) -> dict:
+    login = item.get("login") or {}
+    uris = login.get("uris") or [{}]
+    return {
+        "type": "note" if item.get("type") == 2 else "login",
+        "name": item.get("name"),
+        "url": uris[0].get("uri"),
+        "username": login.get("username"),
+        "password": login.get("password"),
+        "totp": login.get("totp"),
+        "notes": item.get("notes"),
+    }
+
+
+def parse_json(data):
+    # a whole JSON document: a PassMan vault dump, a Bitwarden export, or a
+    # plain list of rows
+    if isinstance(data, dict) and "items" in data:
+        for item in data["items"]:
+            if item.get("type") in (1, 2):
+                yield record_from_row(_bitwarden_row(item))
+    elif isinstance(data, dict):
+        for section in EXPORT_SECTIONS:
+            for record in data.get(section, []):
+                yield record_from_dump(section, record)
+    else:
+        for row in data:
+            yield record_from_row(row)
+
+
+def detect_format(filename: str, head: bytes) -> str:
+    if head.startswith(EXPORT_MAGIC):
+        return "passman"
+    for ext in ("csv", "jsonl", "json"):
+        if filename.lower().endswith("." + ext):
+            return ext
+    return "json" if head.lstrip()[:1] in (b"{", b"[") else "csv"
+
+
+def export_records(vault, records):
+    # records are (section, sealed record) pairs collected up front; each is
+    # decrypted only as the export reaches it
+    for section, record in records:
+        yield section, vault.unseal(record, remember=False)
+
+
+def export_stream(records, passphrase: str, kdf: dict | None = None):
+    # header line with the KDF salt, then one Fernet token per record and a
+    # trailer carrying the count, so a truncated file is detected on import
+    if not passphrase:
+        raise ValueError("Export passphrase cannot be empty")
+
+    salt = generate_salt()
+    kdf = kdf or default_kdf()
+    key = derive_key(passphrase, salt, kdf)
+    meta = {"salt": salt.hex(), "kdf": kdf, "version": EXPORT_VERSION}
+    yield EXPORT_MAGIC + b" " + json.dumps(meta).encode() + b"\n"
+
+    count = 0
+    for section, record in records:
+        yield encrypt_data(json.dumps({"section": section, "record": record}).encode(), key) + b"\n"
+        count += 1
+    yield encrypt_data(json.dumps({"end": count}).encode(), key) + b"\n"
+
+
+def parse_export(lines, passphrase: str):
+    lines = iter(lines)
+    header = next(lines, b"")
+    if not header.startswith(EXPORT_MAGIC + b" "):
+        raise ValueError("Not a PassMan export")
+
+    meta = json.loads(header[len(EXPORT_MAGIC) + 1:])
+    key = derive_key(passphrase, bytes.fromhex(meta["salt"]), meta.get("kdf"))
+
+    count = 0
+    for line in lines:
+        try:
+            plain = decrypt_data(line.strip(), key)
+        except ValueError:
+            # a wrong passphrase fails on the first record, damage on any
+            raise ValueError("Export is corrupted" if count else "Wrong export passphrase or corrupted export") from None
+        item = json.loads(plain)
+        if "end" in item:
+            if item["end"] != count:
+                raise ValueError("Export is corrupted")
+            return
+        yield record_from_dump(item["section"], item["record"])
+        count += 1
+
+    raise ValueError("Export is truncated")
+
+
+def parse_import(stream, fmt: str, passphrase: str = ""):
+    # stream is a binary file object; everything but a whole JSON document
+    # is parsed line by line
+    if fmt == "passman":
+        return parse_export(stream, passphrase)
+
+    lines = (line.decode("utf-8-sig") for line in stream)
+    if fmt == "csv":
+        return parse_csv(lines)
+    if fmt == "jsonl":
+        return parse_jsonl(lines)
+    if fmt == "json":
+        return parse_json(json.loads("".join(lines)))
+    raise ValueError(f"Unknown import format: {fmt}")
+
+
+def load_import(stream, filename: str = "", passphrase: str = "") -> list:
+    # the whole import is parsed before anything touches the vault, so a bad
+    # row rejects the file instead of leaving half of it imported
+    head = stream.read(len(EXPORT_MAGIC))
+    stream.seek(0)
+    return list(parse_import(stream, detect_format(filename, head), passphrase))
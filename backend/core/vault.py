@@ -1,91 +1,197 @@
-import pyotp
 from datetime import datetime
 from datetime import datetime, timedelta
 from backend.core.schema import new_entry, new_note
+from backend.core.ordering import encode_cursor, decode_cursor
+from backend.core.totp import PERIOD as TOTP_PERIOD
 
 def add_entry(vault: dict, site: str, username: str, password: str, tags=None):
     entry = new_entry(site, username, password, tags)
-    vault["entries"].append(entry)
+    vault.put("entries", entry)
     return entry
 
 def add_note(vault: dict, title: str, content: str, tags=None):
     note = new_note(title, content, tags)
-    vault["notes"].append(note)
+    vault.put("notes", note)
     return note
 
 
-def delete_entry(vault: dict, entry_id: str):
-    entries = vault["entries"]
-    for i, entry in enumerate(entries):
-        if entry["id"] == entry_id:
-            return entries.pop(i)
+def _get_entry(vault: dict, entry_id: str):
+    entry = vault.find("entries", entry_id)
+    if entry is None:
+        raise ValueError("Entry not found")
+    return entry
 
-    raise ValueError("Entry not found")
+def _get_note(vault: dict, note_id: str):
+    note = vault.find("notes", note_id)
+    if note is None:
+        raise ValueError("Note not found")
+    return note
 
-def soft_delete_entry(vault: dict, entry_id: str):
-    from datetime import datetime
 
-    for i, entry in enumerate(vault["entries"]):
-        if entry["id"] == entry_id:
-            entry["deleted_at"] = datetime.utcnow().isoformat()
-            vault.setdefault("trash", []).append(entry)
-            return vault["entries"].pop(i)
+def delete_entry(vault: dict, entry_id: str):
+    entry = vault.remove("entries", entry_id)
+    if entry is None:
+        raise ValueError("Entry not found")
+    return entry
 
-    raise ValueError("Entry not found")
+def soft_delete_entry(vault: dict, entry_id: str):
+    entry = delete_entry(vault, entry_id)
+    entry["deleted_at"] = datetime.utcnow().isoformat()
+    vault.put("trash", entry)
+    return entry
 
 
 
 def restore_entry(vault: dict, entry_id: str):
-    for i, entry in enumerate(vault["trash"]):
-        if entry["id"] == entry_id:
-            entry.pop("deleted_at", None)
-            vault["entries"].append(entry)
-            return vault["trash"].pop(i)
+    entry = vault.remove("trash", entry_id)
+    if entry is None:
+        raise ValueError("Entry not found in trash")
 
-    raise ValueError("Entry not found in trash")
+    entry.pop("deleted_at", None)
+    vault.put("entries", entry)
+    return entry
 
 def list_entries(vault: dict):
-    return vault["entries"]
+    return list(vault["entries"].values())
+
+
+def list_page(vault: dict, section: str, sort: str = "site", order: str = "asc", cursor: str | None = None, limit: int = 50):
+    field = "title" if section == "notes" and sort == "site" else sort
+    after = decode_cursor(cursor) if cursor else None
+    ids, last = vault.order.page(section, field, after, limit, reverse=order == "desc")
+    records = vault[section]
+    return [records[i] for i in ids], (encode_cursor(last) if last else None)
 
 
 def search_entries(vault: dict, query: str):
-    query = query.lower()
-    return [
-        e for e in vault["entries"]
-        if query in e["site"].lower()
-        or query in e["username"].lower()
-    ]
+    _, hits = vault.search.search(query, sections=("entries",), limit=None)
+    return [vault["entries"][entry_id] for entry_id, _, _ in hits]
+
+
+def summarize(section: str, record: dict):
+    item = {"id": record["id"], "type": "entry" if section == "entries" else "note", "tags": record.get("tags", [])}
+    if section == "entries":
+        item.update(site=record["site"], username=record["username"])
+    else:
+        item.update(title=record["title"])
+    return item
+
+
+def listing_item(section: str, record: dict):
+    item = summarize(section, record)
+    item["updated_at"] = record["updated_at"]
+    if section == "entries":
+        item["totp_enabled"] = record.get("totp", {}).get("enabled", False)
+    return item
+
+
+def search_vault(vault: dict, query: str, offset: int = 0, limit: int = 20):
+    total, hits = vault.search.search(query, offset=offset, limit=limit)
+    results = []
+    for record_id, section, score in hits:
+        item = listing_item(section, vault[section][record_id])
+        item["score"] = round(score, 3)
+        results.append(item)
+    return {"total": total, "offset": offset, "limit": limit, "results": results}
 
 
 def detect_password_reuse(vault: dict):
-    seen = {}
+    entries = vault["entries"]
     reused = []
 
-    for entry in vault["entries"]:
-        pwd = entry["password"]
-        if pwd in seen:
-            reused.append((seen[pwd], entry))
-        else:
-            seen[pwd] = entry
+    for ids in vault.reuse.groups():
+        first, *others = sorted(ids, key=lambda i: entries[i]["created_at"])
+        reused.extend((entries[first], entries[i]) for i in others)
 
     return reused
 
 
-def get_expired_entries(vault: dict, max_age_days: int = 180):
-    expired = []
-    now = datetime.utcnow()
+def find_password_reuse(vault: dict, password: str, exclude_id: str | None = None):
+    entries = vault["entries"]
+    return [entries[i] for i in vault.reuse.users_of(password, exclude_id)]
 
-    for entry in vault["entries"]:
-        created = datetime.fromisoformat(entry["created_at"])
-        age = now - created
 
-        if age > timedelta(days=max_age_days):
-            expired.append({
-                "entry": entry,
-                "age_days": age.days
-            })
+def reuse_report(vault: dict):
+    entries = vault["entries"]
+    groups = [
+        [summarize("entries", entries[i]) for i in sorted(ids, key=lambda i: entries[i]["site"].lower())]
+        for ids in vault.reuse.groups()
+    ]
+    groups.sort(key=len, reverse=True)
+    return {"groups": groups, "reused_entries": sum(len(g) for g in groups)}
+
+
+def strength_report(entries: list, scores: list, weak_below: int = 2):
+    distribution = {str(score): 0 for score in range(5)}
+    weak = []
+
+    for entry, result in zip(entries, scores):
+        distribution[str(result["score"])] += 1
+        if result["score"] < weak_below:
+            weak.append(dict(summarize("entries", entry), score=result["score"], crack_time=result["crack_time"]))
+
+    weak.sort(key=lambda item: item["score"])
+    return {"total": len(entries), "scores": distribution, "weak": weak}
+
+
+def breach_report(entries: list, flags: list):
+    breached = [summarize("entries", entry) for entry, flag in zip(entries, flags) if flag]
+    breached.sort(key=lambda item: item["site"].lower())
+    return {"total": len(entries), "breached": breached}
+
+
+def import_records(vault: dict, records: list, scores: list | None = None, weak_below: int = 2):
+    # records are (section, record) pairs; scores line up with the entries.
+    # Weak and reused passwords are imported as they are and only counted,
+    # but an entry already in the vault with the same site, username and
+    # password, or a note with the same title and content, is skipped so
+    # importing the same file twice is harmless
+    reuse = vault.reuse
+    seen = {(e["site"], e["username"], e["password_digest"]) for e in vault["entries"].values()}
+    seen_notes = None
+    summary = {"entries": 0, "notes": 0, "skipped": 0, "weak": 0, "reused": 0}
+    scores = iter(scores or ())
+    imported = []
+
+    for section, record in records:
+        if section == "entries":
+            result = next(scores, None)
+            key = (record["site"], record["username"], reuse.digest(record["password"]))
+            if key in seen:
+                summary["skipped"] += 1
+                continue
+            seen.add(key)
+            if result is not None and result["score"] < weak_below:
+                summary["weak"] += 1
+            imported.append(record)
+        else:
+            # note contents are sealed, so they are only read once an import
+            # actually brings notes
+            if seen_notes is None:
+                seen_notes = {
+                    (n["title"], reuse.digest(vault.secrets(n, remember=False)["content"]))
+                    for n in vault["notes"].values()
+                }
+            key = (record["title"], reuse.digest(record["content"]))
+            if key in seen_notes:
+                summary["skipped"] += 1
+                continue
+            seen_notes.add(key)
+
+        vault.put(section, record)
+        summary[section] += 1
+
+    summary["reused"] = sum(1 for e in imported if reuse.users_of_digest(e["password_digest"], e["id"]))
+    return summary
 
-    return expired
+
+def get_expired_entries(vault: dict, max_age_days: int = 180):
+    now = datetime.utcnow()
+    entries = vault["entries"]
+    return [
+        {"entry": entries[entry_id], "age_days": (now - created).days}
+        for entry_id, created in vault.rotation.created_before(now - timedelta(days=max_age_days))
+    ]
 
 
 def needs_rotation(entry: dict) -> bool:
@@ -94,99 +200,128 @@ def needs_rotation(entry: dict) -> bool:
     return datetime.utcnow() - updated > timedelta(days=rotation_days)
 
 def entries_needing_rotation(vault: dict):
-    return [
-        e for e in vault["entries"]
-        if needs_rotation(e)
-    ]
+    entries = vault["entries"]
+    return [entries[entry_id] for entry_id, _ in vault.rotation.due(datetime.utcnow())]
+
+
+def rotation_items(vault: dict, due: list):
+    # (id, due) pairs from the rotation schedule, as listed to the client
+    entries = vault["entries"]
+    return [dict(summarize("entries", entries[i]), due_at=when.isoformat()) for i, when in due]
+
+
+def rotation_report(vault: dict, soon_days: int = 14):
+    # overdue entries plus the ones falling due in the next soon_days, each
+    # earliest first; only the due part of the schedule is walked
+    now = datetime.utcnow()
+    upcoming = list(vault.rotation.due(now + timedelta(days=soon_days)))
+    split = next((i for i, (_, when) in enumerate(upcoming) if when > now), len(upcoming))
+    return {
+        "due": rotation_items(vault, upcoming[:split]),
+        "soon": rotation_items(vault, upcoming[split:]),
+        "soon_days": soon_days,
+    }
 
 
 def enable_totp(vault: dict, entry_id: str, secret: str):
-    for entry in vault["entries"]:
-        if entry["id"] == entry_id:
-            entry["totp"] = {
-                "enabled": True,
-                "secret": secret
-            }
-            return entry
-    raise ValueError("Entry not found")
+    entry = vault.unseal(_get_entry(vault, entry_id))
+    entry["totp"] = {
+        "enabled": True,
+        "secret": secret
+    }
+    return vault.put("entries", entry)
+
+
+def reveal_password(vault: dict, entry_id: str) -> str:
+    return vault.secrets(_get_entry(vault, entry_id))["password"]
 
 
 def get_totp_code(vault: dict, entry_id: str):
-    for entry in vault["entries"]:
-        if entry["id"] == entry_id:
-            if not entry.get("totp", {}).get("enabled"):
-                raise ValueError("TOTP not enabled")
+    entry = _get_entry(vault, entry_id)
+    if not entry.get("totp", {}).get("enabled"):
+        raise ValueError("TOTP not enabled")
 
-            totp = pyotp.TOTP(entry["totp"]["secret"])
-            return totp.now()
+    return vault.totp.code(entry_id)
 
-    raise ValueError("Entry not found")
+
+def totp_codes(vault: dict, ids=None):
+    # the codes of the current window for every enabled entry (or just ids),
+    # and how long they stay valid so the client can refresh at rollover
+    codes, expires_in = vault.totp.current()
+    if ids is not None:
+        codes = {i: codes[i] for i in ids if i in codes}
+    return {"codes": dict(codes), "period": TOTP_PERIOD, "expires_in": round(expires_in, 3)}
 
 def update_password(vault: dict, entry_id: str, new_password: str):
     
     if len(new_password) < 8:
         raise ValueError("Password must be at least 8 characters long")
     
-    for entry in vault["entries"]:
-        if entry["id"] == entry_id:
-            if new_password == entry["password"]:
-                raise ValueError("New password must be different")
-            
-            if new_password in entry.get("password_history", []):
-                raise ValueError("Password was used previously")
-            
-            entry.setdefault("password_history", []).append(entry["password"])
-            entry["password"] = new_password
-            entry["updated_at"] = datetime.utcnow().isoformat()
-            entry["password_history"] = entry["password_history"][-5:]
-            
-            return entry
-        
-    raise ValueError("Entry not found")
+    entry = vault.unseal(_get_entry(vault, entry_id))
+    if new_password == entry["password"]:
+        raise ValueError("New password must be different")
+    
+    if new_password in entry.get("password_history", []):
+        raise ValueError("Password was used previously")
+    
+    entry.setdefault("password_history", []).append(entry["password"])
+    entry["password"] = new_password
+    entry["updated_at"] = datetime.utcnow().isoformat()
+    entry["password_history"] = entry["password_history"][-5:]
+    
+    return vault.put("entries", entry)
 
 
 def update_entry_meta(vault, entry_id, site, username, tags):
-    for e in vault["entries"]:
-        if e["id"] == entry_id:
-            e["site"] = site
-            e["username"] = username
-            e["tags"] = tags
-            e["updated_at"] = datetime.utcnow().isoformat()
-            return
-    raise ValueError("Entry not found")
+    e = _get_entry(vault, entry_id)
+    e["site"] = site
+    e["username"] = username
+    e["tags"] = tags
+    e["updated_at"] = datetime.utcnow().isoformat()
+    return vault.put("entries", e)
 
 def update_note(vault, note_id, title, content, tags):
-    for n in vault["notes"]:
-        if n["id"] == note_id:
-            n["title"] = title
-            n["content"] = content
-            n["tags"] = tags
-            n["updated_at"] = datetime.utcnow().isoformat()
-            return
-    raise ValueError("Note not found")
+    n = vault.unseal(_get_note(vault, note_id))
+    n["title"] = title
+    n["content"] = content
+    n["tags"] = tags
+    n["updated_at"] = datetime.utcnow().isoformat()
+    return vault.put("notes", n)
 
 def soft_delete_note(vault: dict, note_id: str):
-    for i, note in enumerate(vault["notes"]):
-        if note["id"] == note_id:
-            note["type"] = "note"
-            vault["trash"].append(note)
-            del vault["notes"][i]
-            return
-    raise ValueError("Note not found")
+    note = vault.remove("notes", note_id)
+    if note is None:
+        raise ValueError("Note not found")
+
+    note["type"] = "note"
+    vault.put("trash", note)
+    return note
 
 def restore_note(vault: dict, note_id: str):
-    for i, item in enumerate(vault["trash"]):
-        if item["id"] == note_id and item.get("type") == "note":
-            vault["notes"].append(item)
-            del vault["trash"][i]
-            return
-    raise ValueError("Note not found in trash")
+    item = vault.find("trash", note_id)
+    if item is None or item.get("type") != "note":
+        raise ValueError("Note not found in trash")
+
+    vault.remove("trash", note_id)
+    vault.put("notes", item)
+    return item
 
         
         
 def filter_by_tag(vault: dict, tag: str):
-    tag = tag.lower()
-    return [
-        entry for entry in vault["entries"]
-        if tag in [t.lower() for t in entry.get("tags", [])]
-    ]
\ No newline at end of file
+    entries = vault["entries"]
+    return [entries[i] for i in vault.tags.ids.get(tag.lower(), ()) if i in entries]
+
+
+def filter_by_tags(vault: dict, tags, mode: str = "and"):
+    ids = vault.tags.match(tags, mode)
+    results = []
+    for section in ("entries", "notes"):
+        records = vault[section]
+        results.extend(summarize(section, records[i]) for i in ids if i in records)
+    return results
+
+
+def tag_counts(vault: dict, section: str | None = None):
+    counts = vault.tags.counts(section)
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
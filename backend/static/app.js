@@ -1,7 +1,7 @@
 let clearTimer = null;
 
-function copyPassword(password) {
-    navigator.clipboard.writeText(password)
+function copyText(text) {
+    navigator.clipboard.writeText(text)
         .then(() => {
             const status = document.getElementById("copy-status");
             status.textContent = "Password copied! Clipboard clears in 15 seconds.";
@@ -9,7 +9,6 @@ function copyPassword(password) {
             if (clearTimer) {
                 clearTimeout(clearTimer);
             }
-            
             clearTimer = setTimeout(() => {
                 navigator.clipboard.writeText("");
                 status.textContent = "cliboard Cleared.";
@@ -21,6 +20,17 @@ function copyPassword(password) {
     )
 }
 
+function copyPassword(entryId) {
+    // passwords are not part of the page; fetched only when copied
+    fetch(`/password/${entryId}`)
+        .then(res => res.json())
+        .then(data => {
+            if (data.password) {
+                copyText(data.password);
+            }
+        });
+}
+
 function generate() {
     const form = new FormData();
     form.append("length", document.getElementById("len").value);
@@ -50,7 +60,7 @@ function generate() {
 function copyGenerated() {
     const pwd = document.getElementById("result").value;
     if (!pwd) return;
-    copyPassword(pwd); 
+    copyText(pwd); 
 }
 
 function useGenerated() {
@@ -60,28 +70,52 @@ function useGenerated() {
     window.location.href = "/add";
 }
 
-function refreshTotp(entryId) {
-    fetch(`/totp-code/${entryId}`)
+let totpTimer = null;
+
+function refreshTotpCodes() {
+    // every code on the page in one request, refreshed when the window rolls
+    // over for as long as the page shows any. Rows are looked up on each
+    // tick, so ones added by paging or search are kept current too
+    fetch("/totp-codes")
         .then(res => res.json())
         .then(data => {
-            if (data.code) {
-                document.getElementById(`totp-${entryId}`).textContent = ` ${data.code}`;
-            }
+            if (!data.codes) return;
+            Object.entries(data.codes).forEach(([entryId, code]) => {
+                const el = document.getElementById(`totp-${entryId}`);
+                if (el && code) el.textContent = ` ${code}`;
+            });
+            clearTimeout(totpTimer);
+            totpTimer = document.querySelector("[id^='totp-']")
+                ? setTimeout(refreshTotpCodes, data.expires_in * 1000 + 250)
+                : null;
         });
 }
 
-setInterval(() => {
-    document.querySelectorAll("[id^='totp-']").forEach(el => {
-        const entryId = el.id.replace("totp-", "");
-        refreshTotp(entryId);
-    });
-}, 30000);
+document.addEventListener("DOMContentLoaded", () => {
+    if (document.querySelector("[id^='totp-']")) refreshTotpCodes();
+});
+
+function showRotation() {
+    const status = document.getElementById("rotation-status");
+    if (!status) return;
+
+    fetch("/rotation")
+        .then(res => res.json())
+        .then(data => {
+            if (!data.due) return;
+            const parts = [];
+            if (data.due.length) parts.push(`${data.due.length} password(s) due for rotation`);
+            if (data.soon.length) parts.push(`${data.soon.length} due within ${data.soon_days} days`);
+            status.textContent = parts.join(", ");
+            status.classList.toggle("hidden", !parts.length);
+        });
+}
 
 document.addEventListener("DOMContentLoaded", () => {
-    document.querySelectorAll("[id^='totp-']").forEach(el => {
-        const entryId = el.id.replace("totp-", "");
-        refreshTotp(entryId);
-    });
+    if (!document.getElementById("rotation-status")) return;
+    showRotation();
+    // the server pushes an event whenever more entries fall due
+    new EventSource("/rotation/events").addEventListener("rotation", showRotation);
 });
 
 let inactivityTimer = null;
@@ -102,23 +136,132 @@ function resetInactivityTimer() {
 document.addEventListener("DOMContentLoaded", resetInactivityTimer);
 
 
+// the lists only hold the pages loaded so far, so a search asks the server
+// and shows its hits in place of them
+const SEARCH_DELAY = 200;
+const SEARCH_PAGE = 50;
+let searchTimer = null;
+let searchSeq = 0;
+
 function filterEntries() {
-    const q = document.getElementById("search").value.toLowerCase();
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => runSearch(0), SEARCH_DELAY);
+}
 
-    document.querySelectorAll(".entry").forEach(el => {
-        const text = 
-            el.dataset.site +
-            el.dataset.user +
-            el.dataset.tags;
+function runSearch(offset) {
+    const q = document.getElementById("search").value.trim();
+    const listing = document.getElementById("listing");
+    const results = document.getElementById("search-results");
+    const seq = ++searchSeq;
 
-        el.style.display = text.includes(q) ? "" : "none";
-    });
+    if (!q) {
+        results.replaceChildren();
+        results.classList.add("hidden");
+        listing.classList.remove("hidden");
+        return;
+    }
 
-    document.querySelectorAll(".note").forEach(el => {
-        const text =
-            el.dataset.title +
-            el.dataset.tags;
+    const params = new URLSearchParams({q, offset, limit: SEARCH_PAGE});
+    fetch("/search?" + params.toString())
+        .then(res => res.json())
+        .then(data => {
+            // a slower, older search must not replace a newer one
+            if (seq !== searchSeq || !data.results) return;
+            if (!offset) results.replaceChildren();
+            results.querySelector(".more-results")?.remove();
 
-        el.style.display = text.includes(q) ? "" : "none";
+            data.results.forEach(item => {
+                results.appendChild(item.type === "entry" ? entryRow(item) : noteRow(item));
+            });
+            if (data.results.some(item => item.totp_enabled)) refreshTotpCodes();
+            if (!data.total) {
+                const empty = document.createElement("p");
+                empty.className = "text-zinc-500";
+                empty.textContent = "No matches";
+                results.appendChild(empty);
+            }
+
+            const shown = offset + data.results.length;
+            if (shown < data.total) {
+                const more = document.createElement("button");
+                more.className = "more-results btn-sm mt-3";
+                more.textContent = "More results";
+                more.addEventListener("click", () => runSearch(shown));
+                results.appendChild(more);
+            }
+
+            listing.classList.add("hidden");
+            results.classList.remove("hidden");
+        });
+}
+
+
+function escapeHtml(value) {
+    const div = document.createElement("div");
+    div.textContent = value ?? "";
+    return div.innerHTML;
+}
+
+function entryRow(e) {
+    const el = document.createElement("div");
+    el.className = "entry bg-[#161616] border border-[#262626] p-4 rounded flex justify-between items-center";
+    el.innerHTML = `
+        <div>
+            <div class="font-semibold">${escapeHtml(e.site)}</div>
+            <div class="text-sm text-zinc-500">${escapeHtml(e.username)}</div>
+        </div>
+        <div class="flex items-center gap-2">
+            <button class="btn-sm copy">Copy</button>
+            <a href="/edit/${e.id}" class="link">Edit</a>
+            <form method="post" action="/delete/${e.id}">
+                <button class="danger">Delete</button>
+            </form>
+            ${e.totp_enabled
+                ? `<span id="totp-${e.id}" class="text-emerald-500 text-sm"></span>`
+                : `<a href="/totp/${e.id}" class="link">Enable TOTP</a>`}
+        </div>`;
+    el.querySelector(".copy").addEventListener("click", () => copyPassword(e.id));
+    return el;
+}
+
+function noteRow(n) {
+    const el = document.createElement("div");
+    el.className = "note bg-[#161616] border border-[#262626] p-4 rounded flex justify-between items-center";
+    el.innerHTML = `
+        <div>
+            <div class="font-semibold">${escapeHtml(n.title)}</div>
+            ${n.tags.length ? `<div class="text-sm text-zinc-500">${escapeHtml(n.tags.join(", "))}</div>` : ""}
+        </div>
+        <div class="flex gap-2">
+            <a href="/edit-note/${n.id}" class="link">Edit</a>
+            <form method="post" action="/delete-note/${n.id}">
+                <button class="danger">Delete</button>
+            </form>
+        </div>`;
+    return el;
+}
+
+function loadMore(section) {
+    const list = document.getElementById(section);
+    const button = document.getElementById(`more-${section}`);
+    const params = new URLSearchParams({
+        sort: list.dataset.sort,
+        order: list.dataset.order,
+        cursor: button.dataset.cursor,
     });
-}
\ No newline at end of file
+
+    fetch(`/api/${section}?` + params.toString())
+        .then(res => res.json())
+        .then(data => {
+            data.items.forEach(item => {
+                list.appendChild(section === "entries" ? entryRow(item) : noteRow(item));
+            });
+            if (data.items.some(item => item.totp_enabled)) refreshTotpCodes();
+
+            if (data.next_cursor) {
+                button.dataset.cursor = data.next_cursor;
+            } else {
+                button.remove();
+            }
+        });
+}
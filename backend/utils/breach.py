@@ -0,0 +1,186 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from backend.utils.strength import worker_pool
+
+# A breach filter is a sorted table of the first 8 bytes of each breached
+# password's SHA-1 (a false match is ~n / 2**64 likely), after an index of
+# where each run of keys sharing their top prefix_bits bits starts. A lookup
+# reads two index slots and binary-searches one short run in the mapped
+# file, so it costs a few microseconds and only the pages it touches.
+MAGIC = b"PMBREACH"
+VERSION = 1
+HEADER = struct.Struct(">8sIIQ")   # magic, version, prefix_bits, count
+KEY_SIZE = 8
+
+# runs average at most this many keys, within these prefix sizes
+RUN_LENGTH = 256
+MIN_PREFIX_BITS = 8
+MAX_PREFIX_BITS = 20
+
+# passwords per worker task in check_many; fewer are checked in-process
+AUDIT_CHUNK = 4096
+
+
+def key_of(password: str) -> bytes:
+    return hashlib.sha1(password.encode()).digest()[:KEY_SIZE]
+
+
+class BreachFilter:
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, bits, self.count = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not a breach filter")
+        if hasattr(mmap, "MADV_RANDOM"):
+            self.map.madvise(mmap.MADV_RANDOM)
+        self.shift = 64 - bits
+        self.records_at = HEADER.size + ((1 << bits) + 1) * 8
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, password: str) -> bool:
+        return self.contains(key_of(password))
+
+    def contains(self, key: bytes) -> bool:
+        lo, hi = struct.unpack_from(">QQ", self.map, HEADER.size + (int.from_bytes(key, "big") >> self.shift) * 8)
+        data, base = self.map, self.records_at
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            at = base + mid * KEY_SIZE
+            probe = data[at:at + KEY_SIZE]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def close(self):
+        self.map.close()
+
+
+_filters = {}   # path -> (file stamp, BreachFilter), per process
+_filters_lock = threading.Lock()
+
+
+def open_filter(path: Path) -> BreachFilter | None:
+    # None without a filter file; a rebuilt file is picked up on the next
+    # call and the mapping of the old one closed
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    stamp = st.st_ino, st.st_size, st.st_mtime_ns
+    cached = _filters.get(path)
+    if cached is None or cached[0] != stamp:
+        with _filters_lock:
+            old = _filters.get(path)
+            if old is None or old[0] != stamp:
+                cached = _filters[path] = stamp, BreachFilter(path)
+                if old is not None:
+                    old[1].close()
+            else:
+                cached = old
+    return cached[1]
+
+
+def is_breached(password: str, path: Path) -> bool:
+    breach_filter = open_filter(path)
+    return breach_filter is not None and password in breach_filter
+
+
+def _check_keys(path: Path, keys: bytes) -> bytes:
+    # in a worker process: one flag byte per key
+    breach_filter = open_filter(path)
+    return bytes(breach_filter.contains(keys[i:i + KEY_SIZE]) for i in range(0, len(keys), KEY_SIZE))
+
+
+def check_many(passwords: list, path: Path) -> list | None:
+    # breached or not, per password; None without a filter. Only the
+    # truncated hashes are handed to the worker processes
+    if open_filter(path) is None:
+        return None
+
+    keys = b"".join(key_of(p) for p in passwords)
+    step = AUDIT_CHUNK * KEY_SIZE
+    if len(passwords) <= AUDIT_CHUNK:
+        flags = _check_keys(path, keys)
+    else:
+        chunks = [keys[i:i + step] for i in range(0, len(keys), step)]
+        flags = b"".join(worker_pool().map(_check_keys, [path] * len(chunks), chunks))
+    return [bool(flag) for flag in flags]
+
+
+def _read_keys(sources: list, min_count: int):
+    # HIBP dumps: "HASH:COUNT" lines of full SHA-1 hex, or per-prefix range
+    # files named after their 5-character prefix holding "SUFFIX:COUNT"
+    for source in sources:
+        source = Path(source)
+        prefix = source.stem.upper() if len(source.stem) == 5 else ""
+        with open(source, encoding="ascii") as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                digest, _, count = line.partition(":")
+                digest = prefix + digest if len(digest) == 35 else digest
+                if len(digest) != 40:
+                    raise ValueError(f"{source}:{number}: not a SHA-1 hash")
+                if count and int(count) < min_count:
+                    continue
+                yield bytes.fromhex(digest[:KEY_SIZE * 2])
+
+
+def build_filter(sources: list, output: Path, min_count: int = 1) -> int:
+    # two passes over the sources, so any order works and memory stays at
+    # one counter per prefix: count the keys per prefix, then drop each one
+    # into its run in the mapped output and sort the runs
+    counts = [0] * (1 << MAX_PREFIX_BITS)
+    for key in _read_keys(sources, min_count):
+        counts[key[0] << 12 | key[1] << 4 | key[2] >> 4] += 1
+    total = sum(counts)
+
+    bits = min(MAX_PREFIX_BITS, max(MIN_PREFIX_BITS, math.ceil(math.log2(max(1, total / RUN_LENGTH)))))
+    merge = 1 << (MAX_PREFIX_BITS - bits)
+    starts = [0]
+    for i in range(0, len(counts), merge):
+        starts.append(starts[-1] + sum(counts[i:i + merge]))
+    del counts
+
+    records_at = HEADER.size + len(starts) * 8
+    # not *.tmp: recovery deletes those from the storage directory whenever
+    # a vault is opened, which could remove a build still in progress
+    tmp = Path(output).with_suffix(".building")
+    with open(tmp, "w+b") as f:
+        f.truncate(records_at + total * KEY_SIZE)
+        with mmap.mmap(f.fileno(), 0) as data:
+            HEADER.pack_into(data, 0, MAGIC, VERSION, bits, total)
+            struct.pack_into(f">{len(starts)}Q", data, HEADER.size, *starts)
+
+            shift = 64 - bits
+            ends = starts[:-1]
+            for key in _read_keys(sources, min_count):
+                run = int.from_bytes(key, "big") >> shift
+                at = records_at + ends[run] * KEY_SIZE
+                data[at:at + KEY_SIZE] = key
+                ends[run] += 1
+
+            for lo, hi in zip(starts, starts[1:]):
+                if hi - lo > 1:
+                    a, b = records_at + lo * KEY_SIZE, records_at + hi * KEY_SIZE
+                    run = data[a:b]
+                    data[a:b] = b"".join(sorted(run[i:i + KEY_SIZE] for i in range(0, len(run), KEY_SIZE)))
+            data.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, output)
+    return total
@@ -1,5 +1,135 @@
-import secrets
+import os
 import string
+import threading
+from functools import lru_cache
+from zxcvbn.frequency_lists import FREQUENCY_LISTS
+from backend.utils.strength import score_many, MAX_SCORED_LENGTH
+
+SYMBOLS = "!@#$%^&*()-_=+[]{};:,.<>?"
+
+# random bytes are read from the OS this many at a time
+POOL_SIZE = 4096
+
+MAX_BATCH = 10_000
+# scoring rounds before giving up on a min_score the settings can't reach
+MAX_ROUNDS = 8
+
+# the 7776 most frequent plain English words of 4-8 letters (names left
+# out), i.e. the size of a diceware list: ~12.9 bits per word
+WORDLIST_SIZE = 7776
+
+
+class RandomPool:
+    # Unbiased random ints from bulk os.urandom reads. A value is built from
+    # the fewest whole bytes that cover the range, and values at or above
+    # the largest multiple of n are rejected instead of folded in with a
+    # modulo, which would favour the low end.
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self.buf = b""
+        self.pos = 0
+        self.pid = os.getpid()
+
+    def _refill(self, need: int):
+        # a forked child must never reuse bytes its parent already had
+        if self.pos + need > len(self.buf) or self.pid != os.getpid():
+            self.buf, self.pos, self.pid = os.urandom(self.size), 0, os.getpid()
+
+    def _take(self, k: int) -> bytes:
+        self._refill(k)
+        self.pos += k
+        return self.buf[self.pos - k:self.pos]
+
+    def below(self, n: int) -> int:
+        k = max(1, (n - 1).bit_length() + 7 >> 3)
+        limit = (256 ** k // n) * n
+        while True:
+            value = int.from_bytes(self._take(k), "big")
+            if value < limit:
+                return value % n
+
+    def indexes(self, n: int, count: int) -> list:
+        # count values below n; one slice and comprehension per refill when
+        # n fits in a byte, which covers every character set
+        if n > 256:
+            return [self.below(n) for _ in range(count)]
+
+        limit = 256 // n * n
+        out = []
+        while len(out) < count:
+            self._refill(1)
+            chunk = self.buf[self.pos:self.pos + (count - len(out)) * 2]
+            self.pos += len(chunk)
+            out.extend(b % n for b in chunk if b < limit)
+        del out[count:]
+        return out
+
+    def shuffle(self, items: list):
+        # Fisher-Yates, taking one byte per step straight from the buffer
+        # while the list is short enough for that
+        i = len(items) - 1
+        if i >= 256:
+            for i in range(i, 0, -1):
+                j = self.below(i + 1)
+                items[i], items[j] = items[j], items[i]
+            return
+
+        while i > 0:
+            self._refill(1)
+            for b in self.buf[self.pos:]:
+                self.pos += 1
+                n = i + 1
+                if b < 256 // n * n:
+                    j = b % n
+                    items[i], items[j] = items[j], items[i]
+                    i -= 1
+                    if not i:
+                        return
+
+
+# one pool per thread: /generate runs in the threadpool, and two requests
+# must never be handed the same bytes
+_local = threading.local()
+
+
+def random_pool() -> RandomPool:
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = RandomPool()
+    return pool
+
+
+def character_classes(use_upper=True, use_lower=True, use_digits=True, use_symbols=True) -> list:
+    classes = [
+        (use_upper, string.ascii_uppercase),
+        (use_lower, string.ascii_lowercase),
+        (use_digits, string.digits),
+        (use_symbols, SYMBOLS),
+    ]
+    classes = [chars for enabled, chars in classes if enabled]
+    if not classes:
+        raise ValueError("At least one character set must be enabled")
+    return classes
+
+
+def _passwords(count: int, length: int, classes: list, min_each: int, pool: RandomPool) -> list:
+    # min_each characters from every class, the rest from all of them, then
+    # shuffled so the guaranteed ones don't sit at the front. The characters
+    # of the whole batch are drawn together, one run per set
+    charset = "".join(classes)
+    rest = length - min_each * len(classes)
+    runs = [(chars, min_each) for chars in classes] + [(charset, rest)]
+    drawn = [[chars[i] for i in pool.indexes(len(chars), count * n)] for chars, n in runs]
+
+    passwords = []
+    for k in range(count):
+        password = []
+        for (_, n), picks in zip(runs, drawn):
+            password += picks[k * n:(k + 1) * n]
+        pool.shuffle(password)
+        passwords.append("".join(password))
+    return passwords
 
 
 def generate_password(
@@ -7,23 +137,78 @@ def generate_password(
     use_upper: bool = True,
     use_lower: bool = True,
     use_digits: bool = True,
-    use_symbols: bool = True
+    use_symbols: bool = True,
+    min_each: int = 1,
 ) -> str:
+    return generate_passwords(1, length, use_upper, use_lower, use_digits, use_symbols, min_each)[0]
+
+
+def generate_passwords(
+    count: int,
+    length: int = 16,
+    use_upper: bool = True,
+    use_lower: bool = True,
+    use_digits: bool = True,
+    use_symbols: bool = True,
+    min_each: int = 1,
+    min_score: int | None = None,
+) -> list:
     if length < 8:
         raise ValueError("Password length must be at least 8")
 
-    charset = ""
+    classes = character_classes(use_upper, use_lower, use_digits, use_symbols)
+    if min_each < 0 or min_each * len(classes) > length:
+        raise ValueError("Password is too short for the minimum of each character set")
 
-    if use_upper:
-        charset += string.ascii_uppercase
-    if use_lower:
-        charset += string.ascii_lowercase
-    if use_digits:
-        charset += string.digits
-    if use_symbols:
-        charset += "!@#$%^&*()-_=+[]{};:,.<>?"
+    pool = random_pool()
+    return _batch(count, lambda n: _passwords(n, length, classes, min_each, pool), min_score)
 
-    if not charset:
-        raise ValueError("At least one character set must be enabled")
 
-    return "".join(secrets.choice(charset) for _ in range(length))
+@lru_cache(maxsize=1)
+def wordlist() -> tuple:
+    names = set(FREQUENCY_LISTS["female_names"]) | set(FREQUENCY_LISTS["male_names"]) | set(FREQUENCY_LISTS["surnames"])
+    words = []
+    for word in FREQUENCY_LISTS["english_wikipedia"]:
+        if 4 <= len(word) <= 8 and word.isascii() and word.isalpha() and word not in names:
+            words.append(word)
+            if len(words) == WORDLIST_SIZE:
+                break
+    return tuple(words)
+
+
+def generate_passphrases(
+    count: int,
+    words: int = 6,
+    separator: str = "-",
+    capitalize: bool = False,
+    min_score: int | None = None,
+) -> list:
+    if words < 4:
+        raise ValueError("Passphrase must have at least 4 words")
+
+    vocabulary = wordlist()
+    pool = random_pool()
+
+    def passphrases(n):
+        picked = [vocabulary[i].capitalize() if capitalize else vocabulary[i] for i in pool.indexes(len(vocabulary), n * words)]
+        return [separator.join(picked[k:k + words]) for k in range(0, len(picked), words)]
+
+    return _batch(count, passphrases, min_score)
+
+
+def _batch(count: int, make, min_score: int | None) -> list:
+    # with min_score, candidates are scored in bulk as they are made and the
+    # weak ones replaced
+    if not 1 <= count <= MAX_BATCH:
+        raise ValueError(f"Can generate between 1 and {MAX_BATCH} passwords at a time")
+
+    results = []
+    for _ in range(MAX_ROUNDS):
+        candidates = make(count - len(results))
+        if min_score is not None:
+            scores = score_many([c[:MAX_SCORED_LENGTH] for c in candidates])
+            candidates = [c for c, result in zip(candidates, scores) if result["score"] >= min_score]
+        results.extend(candidates)
+        if len(results) == count:
+            return results
+    raise ValueError(f"Could not generate passwords scoring {min_score} or more with these settings")
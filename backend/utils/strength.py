@@ -1,9 +1,114 @@
+import asyncio
+import hmac
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from zxcvbn import zxcvbn
+from backend.core.metrics import timed, timer
 
+CACHE_SIZE = 4096
+WORKERS = os.cpu_count() or 1
+BATCH_CHUNKSIZE = 32
+
+# zxcvbn refuses longer input; anything past it only adds strength, so the
+# score of the first 72 characters stands for the whole password
+MAX_SCORED_LENGTH = 72
+
+# cache keys are HMACs under a per-process random key, so the cache never
+# holds anything that could be looked up offline
+_CACHE_KEY = os.urandom(32)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@timed("check_strength")
 def check_strength(password: str) -> dict:
-    result = zxcvbn(password)
+    result = zxcvbn(password[:MAX_SCORED_LENGTH])
     return {
         "score": result["score"],  # 0 (weak) → 4 (strong)
         "crack_time": result["crack_times_display"]["offline_fast_hashing_1e10_per_second"],
         "feedback": result["feedback"]
     }
+
+
+def worker_pool() -> ProcessPoolExecutor:
+    # shared by strength scoring and the breach audit
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # never forked straight from the server, which runs threads
+            # (the threadpool, the unlock executor) that a fork can deadlock on
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context(method))
+        return _executor
+
+
+def shutdown_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+def _cache_key(password: str) -> bytes:
+    return hmac.new(_CACHE_KEY, password.encode(), hashlib.sha256).digest()
+
+
+def _cache_get(key: bytes):
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+        return result
+
+
+def _cache_put(key: bytes, result: dict):
+    with _cache_lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def score_password(password: str) -> dict:
+    key = _cache_key(password)
+    result = _cache_get(key)
+    if result is None:
+        with timer("score_password"):
+            result = worker_pool().submit(check_strength, password).result()
+        _cache_put(key, result)
+    return result
+
+
+async def score_password_async(password: str) -> dict:
+    key = _cache_key(password)
+    result = _cache_get(key)
+    if result is None:
+        with timer("score_password"):
+            future = worker_pool().submit(check_strength, password)
+            result = await asyncio.wrap_future(future)
+        _cache_put(key, result)
+    return result
+
+
+def score_many(passwords) -> list:
+    keys = [_cache_key(p) for p in passwords]
+    results = [_cache_get(k) for k in keys]
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        with timer("score_many"):
+            scored = worker_pool().map(
+                check_strength, [passwords[i] for i in missing], chunksize=BATCH_CHUNKSIZE
+            )
+            for i, result in zip(missing, scored):
+                results[i] = result
+                _cache_put(keys[i], result)
+
+    return results
@@ -0,0 +1,67 @@
+import argparse
+import time
+import tracemalloc
+from backend.core.auth import serialize_vault, parse_vault
+from backend.core.codec import CODECS
+from backend.core.crypto import CHUNK_SIZE
+from backend.core.model import Vault
+from backend.core.schema import new_entry, new_note
+
+
+def build_vault(n: int) -> Vault:
+    vault = Vault()
+    for i in range(n):
+        vault.put("entries", new_entry(f"site-{i}.example", f"user{i}", f"pw-{i}-Xq9!vLp2", ["bench"]))
+        if i % 10 == 0:
+            vault.put("notes", new_note(f"note {i}", "lorem ipsum " * 40, ["bench"]))
+    return vault
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def traced_peak(fn, *args) -> int:
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def encode(vault: Vault, codec: str) -> bytes:
+    return b"".join(serialize_vault(vault, codec))
+
+
+def decode(data: bytes, codec: str, cipher) -> Vault:
+    # fed as memoryview slices of the decrypted chunk size, the way the
+    # loader sees a snapshot, without copying the buffer first
+    view = memoryview(data)
+    chunks = (view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE))
+    return Vault.from_records(parse_vault(chunks, codec), cipher)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the vault snapshot codecs")
+    parser.add_argument("--entries", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    for n in args.entries:
+        vault = build_vault(n)
+        print(f"{n} entries")
+        for codec in CODECS:
+            data, encode_time = timed(encode, vault, codec)
+            _, decode_time = timed(decode, data, codec, vault.cipher)
+            # decode_peak includes rebuilding the vault and its indexes
+            decode_peak = traced_peak(decode, data, codec, vault.cipher)
+            print(
+                f"  {codec:<8} size {len(data) / 1e6:6.1f} MB"
+                f"  encode {encode_time * 1000:7.1f} ms"
+                f"  decode {decode_time * 1000:7.1f} ms ({decode_peak / 1e6:6.1f} MB peak)"
+            )
+
+
+if __name__ == "__main__":
+    main()
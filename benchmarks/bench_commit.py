@@ -0,0 +1,89 @@
+import argparse
+import itertools
+import tempfile
+import time
+from pathlib import Path
+from backend.core.auth import serialize_vault
+from backend.core.crypto import generate_salt, derive_key, encrypt_stream
+from backend.core.journal import start_journal, append_record, append_changes, encode_change
+from backend.core.model import Vault
+from backend.core.schema import new_entry
+from backend.core.storage import FORMAT_VERSION, atomic_write_chunks, encode_header
+
+
+def build_vault(n: int) -> Vault:
+    vault = Vault()
+    for i in range(n):
+        vault.put("entries", new_entry(f"site-{i}.example", f"user{i}", f"pw-{i}-Xq9!vLp2", ["bench"]))
+    return vault
+
+
+def bench_snapshot(directory: Path, key: bytes, salt: bytes, vault: Vault, fsync: bool, rounds: int) -> float:
+    path = directory / "vault.enc"
+    start = time.perf_counter()
+    for _ in range(rounds):
+        header = encode_header({"salt": salt.hex(), "version": FORMAT_VERSION})
+        body = encrypt_stream(serialize_vault(vault), key, header)
+        atomic_write_chunks(path, itertools.chain([header], body), fsync)
+    return (time.perf_counter() - start) / rounds
+
+
+def bench_journal(directory: Path, key: bytes, batch: int, rounds: int) -> float:
+    path = directory / f"vault-{batch}.journal"
+    mac = b"\0" * 32
+    start_journal(path, mac)
+    record = new_entry("site.example", "user", "pw-Xq9!vLp2", ["bench"])
+
+    start = time.perf_counter()
+    for i in range(1, rounds + 1):
+        fsync = batch > 0 and i % batch == 0
+        mac, _ = append_record(path, key, mac, "update", "entries", record, fsync)
+    return (time.perf_counter() - start) / rounds
+
+
+def bench_group(directory: Path, key: bytes, group: int, rounds: int) -> float:
+    # one append and one fsync per flush of `group` coalesced changes
+    path = directory / f"vault-group-{group}.journal"
+    mac = b"\0" * 32
+    start_journal(path, mac)
+    change = encode_change("update", "entries", new_entry("site.example", "user", "pw-Xq9!vLp2", ["bench"]))
+
+    start = time.perf_counter()
+    for _ in range(max(1, rounds // group)):
+        mac, _ = append_changes(path, key, mac, [change] * group)
+    return (time.perf_counter() - start) / (max(1, rounds // group) * group)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vault commit latency across fsync settings")
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    salt = generate_salt()
+    key = derive_key("benchmark-password", salt)
+    vault = build_vault(args.entries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        snapshot_rounds = max(1, args.rounds // 10)
+
+        print(f"snapshot commit, {args.entries} entries")
+        for fsync in (True, False):
+            latency = bench_snapshot(directory, key, salt, vault, fsync, snapshot_rounds)
+            print(f"  fsync={str(fsync):<5}  {latency * 1000:8.3f} ms/commit")
+
+        print("journal append, one record")
+        for batch in (1, 8, 32, 0):
+            label = "never" if batch == 0 else f"every {batch}"
+            latency = bench_journal(directory, key, batch, args.rounds)
+            print(f"  fsync {label:<9} {latency * 1000:8.3f} ms/commit")
+
+        print("journal group commit, fsync per flush")
+        for group in (1, 8, 32, 256):
+            latency = bench_group(directory, key, group, args.rounds)
+            print(f"  {group:>3} per flush  {latency * 1000:8.3f} ms/change")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import io
+import itertools
+import json
+import time
+import tracemalloc
+from backend.core.auth import serialize_vault, parse_vault
+from backend.core.crypto import generate_salt, derive_key, encrypt_data, decrypt_data, encrypt_stream, decrypt_stream
+from backend.core.integrity import compute_hmac, verify_hmac
+from backend.core.model import Vault
+from backend.core.schema import new_entry, new_note
+from backend.core.storage import encode_header, read_header
+
+
+def build_vault(n: int) -> Vault:
+    vault = Vault()
+    for i in range(n):
+        vault.put("entries", new_entry(f"site-{i}.example", f"user{i}", f"pw-{i}-Xq9!vLp2", ["bench"]))
+        if i % 10 == 0:
+            vault.put("notes", new_note(f"note {i}", "lorem ipsum " * 40, ["bench"]))
+    return vault
+
+
+def write_v1(vault: Vault, key: bytes) -> bytes:
+    encrypted = encrypt_data(json.dumps(vault.to_dict()).encode(), key)
+    return encode_header({"hmac": compute_hmac(key, encrypted).hex(), "version": 1}) + encrypted
+
+
+def read_v1(data: bytes, key: bytes) -> Vault:
+    f = io.BytesIO(data)
+    header, _ = read_header(f)
+    encrypted = f.read()
+    if not verify_hmac(key, encrypted, bytes.fromhex(header["hmac"])):
+        raise RuntimeError("Vault integrity check failed")
+    return Vault(json.loads(decrypt_data(encrypted, key)))
+
+
+def write_v2(vault: Vault, key: bytes) -> bytes:
+    header = encode_header({"version": 2})
+    return b"".join(itertools.chain([header], encrypt_stream(serialize_vault(vault), key, header)))
+
+
+def read_v2(data: bytes, key: bytes) -> Vault:
+    _, line = read_header(io.BytesIO(data))
+    return Vault.from_records(parse_vault(decrypt_stream(memoryview(data), key, line, len(line))))
+
+
+def measure(fn, *args):
+    # wall time, then the peak allocated on top of what already exists in a
+    # second, traced run (tracing slows small allocations down a lot)
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Fernet and chunked AES-GCM vault formats")
+    parser.add_argument("--entries", type=int, default=20000)
+    args = parser.parse_args()
+
+    key = derive_key("benchmark-password", generate_salt())
+    vault = build_vault(args.entries)
+    plain = sum(len(line) for line in serialize_vault(vault))
+    print(f"{args.entries} entries, {plain / 1e6:.1f} MB of records")
+
+    for name, write, read in (("v1 fernet+hmac", write_v1, read_v1), ("v2 aes-gcm stream", write_v2, read_v2)):
+        data, write_time, write_peak = measure(write, vault, key)
+        _, read_time, read_peak = measure(read, data, key)
+        # the write peak includes the joined output, which a real write streams to disk
+        print(
+            f"  {name:<18} size {len(data) / 1e6:6.1f} MB"
+            f"  write {write_time * 1000:7.1f} ms ({(write_peak - len(data)) / 1e6:5.1f} MB)"
+            f"  load {read_time * 1000:7.1f} ms ({read_peak / 1e6:5.1f} MB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
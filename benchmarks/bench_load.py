@@ -0,0 +1,117 @@
+import argparse
+import itertools
+import json
+import mmap
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+from backend.core.auth import serialize_vault, parse_vault
+from backend.core.crypto import generate_salt, derive_key, encrypt_data, decrypt_data, encrypt_stream, decrypt_stream
+from backend.core.integrity import compute_hmac, verify_hmac
+from backend.core.model import Vault
+from backend.core.schema import new_entry, new_note
+from backend.core.storage import encode_header, read_header
+
+NOTE = "lorem ipsum dolor sit amet " * 160   # ~4 KB secure notes
+
+
+def build_vault(n: int) -> Vault:
+    vault = Vault()
+    for i in range(n):
+        vault.put("entries", new_entry(f"site-{i}.example", f"user{i}", f"pw-{i}-Xq9!vLp2", ["bench"]))
+        if i % 10 == 0:
+            vault.put("notes", new_note(f"note {i}", NOTE, ["bench"]))
+    return vault
+
+
+def write_v1(path: Path, vault: Vault, key: bytes):
+    encrypted = encrypt_data(json.dumps(vault.to_dict()).encode(), key)
+    path.write_bytes(encode_header({"hmac": compute_hmac(key, encrypted).hex(), "version": 1}) + encrypted)
+
+
+def write_v2(path: Path, vault: Vault, key: bytes):
+    header = encode_header({"version": 2})
+    with open(path, "wb") as f:
+        f.writelines(itertools.chain([header], encrypt_stream(serialize_vault(vault), key, header)))
+
+
+def load_v1(path: Path, key: bytes) -> Vault:
+    with open(path, "rb") as f:
+        header, _ = read_header(f)
+        encrypted = f.read()
+    if not verify_hmac(key, encrypted, bytes.fromhex(header["hmac"])):
+        raise RuntimeError("Vault integrity check failed")
+    return Vault(json.loads(decrypt_data(encrypted, key)))
+
+
+def load_v2_read(path: Path, key: bytes) -> Vault:
+    # the whole file in one buffer, then the chunk stream over it
+    with open(path, "rb") as f:
+        _, line = read_header(f)
+        data = line + f.read()
+    return Vault.from_records(parse_vault(decrypt_stream(memoryview(data), key, line, len(line))))
+
+
+def load_v2_mmap(path: Path, key: bytes) -> Vault:
+    # what backend.core.auth._load does
+    with open(path, "rb") as f:
+        _, line = read_header(f)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return Vault.from_records(parse_vault(decrypt_stream(mapped, key, line, len(line))))
+
+
+LOADERS = {"v1 read": load_v1, "v2 read": load_v2_read, "v2 mmap": load_v2_mmap}
+
+
+def _status(field: str) -> int:
+    # Linux only; VmHWM is the peak RSS of this process image (ru_maxrss
+    # would carry the parent's peak over the exec)
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError(f"{field} not in /proc/self/status")
+
+
+def _measure(loader: str, path: str, key: bytes, results):
+    # runs in a fresh process so each loader starts from the same baseline
+    before = _status("VmRSS")
+    start = time.perf_counter()
+    LOADERS[loader](Path(path), key)
+    elapsed = time.perf_counter() - start
+    results.put((elapsed, _status("VmHWM") - before))
+
+
+def measure(loader: str, path: Path, key: bytes):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(loader, str(path), key, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of loading a vault, per loader")
+    parser.add_argument("--entries", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    key = derive_key("benchmark-password", generate_salt())
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.entries:
+            vault = build_vault(n)
+            v1, v2 = Path(tmp) / "v1.enc", Path(tmp) / "v2.enc"
+            write_v1(v1, vault, key)
+            write_v2(v2, vault, key)
+            del vault
+            print(f"{n} entries, file {v2.stat().st_size / 1e6:.1f} MB")
+
+            for loader, path in (("v1 read", v1), ("v2 read", v2), ("v2 mmap", v2)):
+                elapsed, peak = measure(loader, path, key)
+                print(f"  {loader:<8} load {elapsed * 1000:8.1f} ms  peak RSS +{peak / 1e6:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
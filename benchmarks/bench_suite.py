@@ -0,0 +1,283 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from backend.core import auth
+from backend.core.auth import VaultPaths, create_vault, unlock_vault, reload_vault, lock_vault, target_kdf
+from backend.core.crypto import generate_salt, derive_key, encrypt_data, decrypt_data
+from backend.core.vault import search_entries, detect_password_reuse, entries_needing_rotation
+from backend.utils.breach import build_filter, is_breached, check_many
+from backend.utils.password_gen import generate_password
+from backend.utils.strength import check_strength, shutdown_pool
+from benchmarks.synthetic import SIZES, WORDS, synthetic_records, synthetic_vault
+
+MASTER = "benchmark master password"
+GROUPS = ("crypto", "storage", "vault", "utils", "http")
+
+# a result more than this much slower than the baseline is a regression
+THRESHOLD = 0.2
+
+
+def measure(fn, min_time: float = 0.5, min_rounds: int = 3, max_rounds: int = 1000) -> dict:
+    # calls fn until min_time has passed (at least min_rounds times); the
+    # median is what --baseline compares
+    times = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < min_rounds or (len(times) < max_rounds and time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return _summary(times)
+
+
+def _summary(times: list) -> dict:
+    times = sorted(times)
+    at = lambda q: times[min(len(times) - 1, int(q * len(times)))] * 1000
+    return {
+        "rounds": len(times),
+        "median_ms": round(at(0.5), 4),
+        "min_ms": round(times[0] * 1000, 4),
+        "p95_ms": round(at(0.95), 4),
+    }
+
+
+def bench_crypto(vault):
+    kdf = target_kdf()
+    salt = generate_salt()
+    yield "derive_key", measure(lambda: derive_key(MASTER, salt, kdf), min_rounds=1)
+
+    key = derive_key(MASTER, salt, kdf)
+    data = json.dumps(vault.to_dict()).encode()
+    token = encrypt_data(data, key)
+    yield "encrypt_data", dict(measure(lambda: encrypt_data(data, key), min_rounds=1), bytes=len(data))
+    yield "decrypt_data", dict(measure(lambda: decrypt_data(token, key), min_rounds=1), bytes=len(data))
+
+
+def _write_vault(paths: VaultPaths, n: int, seed: int):
+    create_vault(MASTER, paths)
+    vault, session = unlock_vault(MASTER, upgrade=False, paths=paths)
+    for section, record in synthetic_records(n, seed):
+        vault.put(section, record)
+    lock_vault(vault, session)
+    session.zeroize()
+
+
+def bench_storage(n: int, seed: int, directory: Path):
+    paths = VaultPaths(directory / "vault.enc", directory / "vault.journal", directory / "vault.lock")
+    _write_vault(paths, n, seed)
+    vault, session = unlock_vault(MASTER, upgrade=False, paths=paths)
+
+    # unlock is key derivation plus load; reload_vault is the load alone
+    yield "unlock_vault", dict(measure(lambda: unlock_vault(MASTER, upgrade=False, paths=paths)[1].zeroize(), min_rounds=1), bytes=paths.vault.stat().st_size)
+    yield "reload_vault", measure(lambda: reload_vault(session), min_rounds=1)
+    yield "lock_vault", measure(lambda: lock_vault(vault, session), min_rounds=1)
+    session.zeroize()
+
+
+def bench_vault(vault):
+    words = itertools.cycle(WORDS)
+    sites = itertools.cycle([e["site"] for e in itertools.islice(vault["entries"].values(), 100)])
+    yield "search_entries", measure(lambda: search_entries(vault, next(words)))
+    yield "search_entries_exact", measure(lambda: search_entries(vault, next(sites)))
+    yield "detect_password_reuse", measure(lambda: detect_password_reuse(vault))
+    yield "entries_needing_rotation", measure(lambda: entries_needing_rotation(vault))
+
+
+def bench_utils(seed: int):
+    passwords = itertools.cycle([r["password"] for section, r in synthetic_records(50, seed) if section == "entries"])
+    yield "check_strength", measure(lambda: check_strength(next(passwords)))
+    yield "generate_password", measure(lambda: generate_password(16))
+    yield "generate_password_64", measure(lambda: generate_password(64))
+
+
+def bench_breach(n: int, seed: int, directory: Path):
+    # a filter of the synthetic vault's passwords; half the lookups hit
+    passwords = [r["password"] for section, r in synthetic_records(n, seed) if section == "entries"]
+    dump = directory / "breached.txt"
+    dump.write_text("".join(hashlib.sha1(p.encode()).hexdigest().upper() + ":1\n" for p in passwords[::2]))
+    path = directory / "breached.filter"
+    build_filter([dump], path)
+
+    cycle = itertools.cycle(passwords[:1000])
+    yield "breach_lookup", measure(lambda: is_breached(next(cycle), path))
+    yield "breach_audit", measure(lambda: check_many(passwords, path), min_rounds=1)
+
+
+# GET routes timed one request at a time, then the read-only ones under load
+ROUTES = (
+    "/dashboard",
+    "/api/entries?limit=50",
+    "/search?q=mail",
+    "/tags",
+    "/tags/filter?tag=work&tag=dev",
+    "/reuse",
+    "/rotation",
+    "/totp-codes",
+    "/generate?count=100",
+)
+LOAD_ROUTES = ("/api/entries?limit=50", "/search?q=bank", "/tags", "/totp-codes")
+
+
+def _load(client, concurrency: int, requests: int) -> dict:
+    # requests spread over the LOAD_ROUTES from concurrency threads at once
+    routes = itertools.cycle(LOAD_ROUTES)
+    urls = [next(routes) for _ in range(requests)]
+
+    def fetch(url):
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} answered {response.status_code}")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        times = list(pool.map(fetch, urls))
+    elapsed = time.perf_counter() - start
+    return dict(_summary(times), concurrency=concurrency, requests_per_s=round(requests / elapsed, 1))
+
+
+def bench_http(n: int, seed: int, directory: Path, concurrency: int):
+    # the whole app in process: storage pointed at a scratch directory, one
+    # user unlocked through the lock screen like a browser would
+    from fastapi.testclient import TestClient
+    from backend import app as appmod
+
+    auth.STORAGE_DIR = directory
+    for name in ("VAULT_PATH", "JOURNAL_PATH", "LOCK_PATH"):
+        setattr(auth, name, directory / getattr(auth, name).name)
+    _write_vault(auth.vault_paths("bench"), n, seed)
+    with TestClient(appmod.app) as client:
+        response = client.post("/", data={"master": MASTER, "user": "bench"}, follow_redirects=False)
+        if response.status_code != 302:
+            raise RuntimeError(f"unlock failed: {response.status_code}")
+
+        for route in ROUTES:
+            def get():
+                if client.get(route).status_code != 200:
+                    raise RuntimeError(f"{route} failed")
+            yield f"GET {route}", measure(get)
+
+        entry_ids = itertools.cycle(list(itertools.islice(appmod.SESSIONS.vaults[str(directory / "users" / "bench")].vault["entries"], 100)))
+        yield "GET /password/{id}", measure(lambda: client.get(f"/password/{next(entry_ids)}"))
+
+        counter = itertools.count()
+        yield "POST /add", measure(lambda: client.post(
+            "/add",
+            data={"site": f"added{next(counter)}.example", "username": "u", "password": generate_password(20)},
+            follow_redirects=False,
+        ), min_rounds=1, max_rounds=50)
+
+        yield "load", _load(client, concurrency, 50 * concurrency)
+        client.get("/lock")
+
+
+def run(args) -> list:
+    results = []
+
+    def record(group, size, items):
+        for name, stats in items:
+            results.append(dict(group=group, name=name, size=size, **stats))
+            print(f"{group:<8} {name:<34} {'' if size is None else size:>7} {stats['median_ms']:>12.3f} ms", file=sys.stderr)
+
+    if "utils" in args.groups:
+        record("utils", None, bench_utils(args.seed))
+
+    for n in args.sizes:
+        needs_vault = {"crypto", "vault"} & set(args.groups)
+        vault = synthetic_vault(n, args.seed) if needs_vault else None
+        if "crypto" in args.groups:
+            record("crypto", n, bench_crypto(vault))
+        if "vault" in args.groups:
+            record("vault", n, bench_vault(vault))
+        del vault
+
+        with tempfile.TemporaryDirectory() as tmp:
+            if "utils" in args.groups:
+                record("utils", n, bench_breach(n, args.seed, Path(tmp)))
+        with tempfile.TemporaryDirectory() as tmp:
+            if "storage" in args.groups:
+                record("storage", n, bench_storage(n, args.seed, Path(tmp)))
+        with tempfile.TemporaryDirectory() as tmp:
+            if "http" in args.groups:
+                record("http", n, bench_http(n, args.seed, Path(tmp), args.concurrency))
+
+    return results
+
+
+def _commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(results: list, baseline: dict) -> list:
+    # (key, baseline ms, current ms, ratio) for each result the baseline also has
+    key = lambda r: (r["group"], r["name"], r["size"])
+    before = {key(r): r["median_ms"] for r in baseline["results"]}
+    rows = []
+    for r in results:
+        old = before.get(key(r))
+        if old:
+            rows.append((key(r), old, r["median_ms"], r["median_ms"] / old))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Timings of the crypto, storage, vault and HTTP paths, as JSON")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="entries per synthetic vault")
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel clients in the HTTP load test")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    try:
+        results = run(args)
+    finally:
+        shutdown_pool()
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "date": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "kdf": target_kdf(),
+            "seed": args.seed,
+            "sizes": args.sizes,
+        },
+        "results": results,
+    }
+    out = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(out + "\n")
+    else:
+        print(out)
+
+    if args.baseline:
+        regressions = 0
+        for (group, name, size), old, new, ratio in compare(results, json.loads(Path(args.baseline).read_text())):
+            flag = "REGRESSION" if ratio > 1 + args.threshold else ""
+            regressions += bool(flag)
+            print(f"{group:<8} {name:<34} {'' if size is None else size:>7} {old:>10.3f} -> {new:>10.3f} ms  x{ratio:.2f} {flag}", file=sys.stderr)
+        if regressions:
+            sys.exit(f"{regressions} regression(s) over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
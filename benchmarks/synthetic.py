@@ -0,0 +1,51 @@
+import base64
+import random
+import uuid
+from datetime import datetime, timedelta
+from backend.core.model import Vault
+from backend.core.schema import new_entry, new_note
+
+SIZES = (100, 10_000, 100_000)
+
+WORDS = (
+    "mail", "bank", "cloud", "shop", "news", "photo", "music", "travel", "health", "school",
+    "game", "stream", "forum", "social", "work", "store", "video", "drive", "chat", "home",
+)
+TLDS = ("com", "org", "net", "io", "dev", "co.uk")
+TAGS = ("work", "personal", "finance", "social", "shopping", "dev", "family", "travel")
+CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@#$%^&*"
+NOTE = "lorem ipsum dolor sit amet " * 40
+
+
+def synthetic_records(n: int, seed: int = 0, reuse: float = 0.05, totp: float = 0.1, notes_every: int = 10):
+    # (section, record) pairs for n entries built with backend/core/schema.py.
+    # Everything but the timestamps' reference point is drawn from the seed:
+    # ~5% reused passwords, ~10% with TOTP, ages up to 400 days so about half
+    # are due for rotation, and one note per notes_every entries
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    passwords = []
+
+    for i in range(n):
+        if passwords and rng.random() < reuse:
+            password = rng.choice(passwords)
+        else:
+            password = "".join(rng.choices(CHARS, k=rng.randint(10, 24)))
+            passwords.append(password)
+
+        site = f"{rng.choice(WORDS)}{i}.{rng.choice(TLDS)}"
+        entry = new_entry(site, f"user{i}@example.com", password, rng.sample(TAGS, rng.randint(0, 3)))
+        entry["id"] = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        entry["created_at"] = entry["updated_at"] = (now - timedelta(days=rng.randrange(400))).isoformat()
+        if rng.random() < totp:
+            entry["totp"] = {"enabled": True, "secret": base64.b32encode(rng.randbytes(20)).decode()}
+        yield "entries", entry
+
+        if i % notes_every == 0:
+            note = new_note(f"{rng.choice(WORDS)} note {i}", NOTE, rng.sample(TAGS, rng.randint(0, 2)))
+            note["id"] = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            yield "notes", note
+
+
+def synthetic_vault(n: int, seed: int = 0) -> Vault:
+    return Vault.from_records(synthetic_records(n, seed))
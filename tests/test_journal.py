@@ -0,0 +1,34 @@
+import os
+from backend.core.auth import VaultPaths, create_vault, unlock_vault, record_changes, read_new_changes
+from backend.core.journal import encode_change
+from backend.core.schema import new_entry
+
+MASTER = "correct horse battery staple"
+
+
+def _paths(tmp_path) -> VaultPaths:
+    return VaultPaths(tmp_path / "vault.enc", tmp_path / "vault.journal", tmp_path / "vault.lock")
+
+
+def _add(vault, session, site: str):
+    entry = new_entry(site, "user", "Xq9!vLp2#Rk1")
+    vault.put("entries", entry)
+    record_changes(session, [encode_change("add", "entries", entry)])
+
+
+def test_append_after_torn_tail(tmp_path):
+    paths = _paths(tmp_path)
+    create_vault(MASTER, paths)
+    vault, session = unlock_vault(MASTER, upgrade=False, paths=paths)
+    _add(vault, session, "first.example")
+
+    # a writer that died halfway through its record
+    with open(paths.journal, "ab") as f:
+        f.write(b"0123abcd torn-token")
+
+    assert read_new_changes(session) == []
+    _add(vault, session, "second.example")
+    assert os.path.getsize(paths.journal) == session.offset
+
+    reopened, _ = unlock_vault(MASTER, upgrade=False, paths=paths)
+    assert sorted(e["site"] for e in reopened["entries"].values()) == ["first.example", "second.example"]